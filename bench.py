@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Micro benchmarks for project.py.
+
+Each benchmark runs over growing table sizes and prints the time per row, so a
+flat last column means the operation scales linearly (or better). Steps that are
+different ways of doing the same thing (row and column storage, with and without
+an index, in memory and spilled) must return the same result, a benchmark stops
+with an AssertionError if they don't.
+
+Examples:
+    py bench.py              runs every benchmark
+    py bench.py where join   runs only the named benchmarks
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+import project
+
+SIZES = [1000, 2000, 4000, 8000, 16000, 32000, 64000]
+SPILL_MEMORY = 1 << 18  # sort and DISTINCT budget for the spill variants
+NESTED_LOOP_ROWS = 4000  # the nested loop join is quadratic, it is skipped past this size
+
+
+def timed(fn):
+    # returns (seconds, what fn returned)
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def report(label, rows, seconds):
+    print(f"{label:>28} {rows:>8} rows {seconds:10.4f}s {seconds / rows * 1e6:10.2f}us/row")
+
+
+def run(rows, steps, same=False, memory=False):
+    """
+    Times and reports each (label, fn) step in order.
+    same   : the steps are alternatives, they have to return equal results
+    memory : also report the peak bytes each step allocated (traced in a second run,
+             tracing slows python code down)
+    """
+    results = []
+    for label, fn in steps:
+        seconds, result = timed(fn)
+        report(label, rows, seconds)
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{'':>28} {peak / 1024:10.1f}KiB allocated")
+        results.append(result)
+    if same and any(result != results[0] for result in results):
+        raise AssertionError(f"{', '.join(label for label, fn in steps)} returned different results")
+
+
+def bench_values(rows):
+    # (grp, id, score) rows: 100 groups, ids in a shuffled order and every score twice
+    return [(i % 100, (i * 7919) % rows, (i * 7919) % rows // 2 + 0.5) for i in range(rows)]
+
+
+def insert_statement(name, rows):
+    values = ", ".join(f"({grp}, {i}, {score})" for grp, i, score in bench_values(rows))
+    return f"INSERT INTO {name} VALUES {values};"
+
+
+@contextmanager
+def filled(rows, columnar=False, index=None, name="bench"):
+    # a :memory: table of rows (grp, id, score) rows, the database is forgotten afterwards
+    conn = project.connect(":memory:", columnar=columnar)
+    conn.execute(f"CREATE TABLE {name} (grp INTEGER, id INTEGER, score REAL);")
+    conn.executemany(f"INSERT INTO {name} VALUES (?, ?, ?);", bench_values(rows))
+    if index:
+        conn.execute(f"CREATE INDEX {name}_{index} ON {name} ({index});")
+    try:
+        yield conn
+    finally:
+        forget(":memory:")
+
+
+def forget(filename):
+    # drops what the process holds for a database, the next connect starts over
+    for shared in (project._ALL_DATABASES, project._LOCKS, project._WALS):
+        shared.pop(filename, None)
+
+
+@contextmanager
+def budget(memory):
+    # sorts and DISTINCT spill to disk past memory bytes, None leaves the limits as they are
+    saved = project._SORT_MEMORY, project._DISTINCT_MEMORY
+    if memory != None:
+        project._SORT_MEMORY = project._DISTINCT_MEMORY = memory
+    try:
+        yield
+    finally:
+        project._SORT_MEMORY, project._DISTINCT_MEMORY = saved
+
+
+# (query, variants) for bench_query, {table} is the variant's table. a variant is a table setup:
+#   row, column  : row or column storage
+#   index:<col>  : row storage with an index on col
+#   spill        : row storage, sorts and DISTINCT spill past SPILL_MEMORY
+QUERIES = {
+    "where": ("SELECT * FROM {table} WHERE id < {quarter} ORDER BY id;", ["row", "column", "index:id"]),
+    "predicates": ("SELECT * FROM {table} WHERE (id BETWEEN 100 AND 900 OR id IN (5, 50, 500)) AND NOT score < 10.0;",
+                   ["row", "column"]),
+    "topk": ("SELECT * FROM {table} ORDER BY id DESC LIMIT 20;", ["row", "column", "index:id"]),
+    "sort": ("SELECT * FROM {table} ORDER BY grp DESC, score, id;", ["row", "column", "spill"]),
+    "distinct": ("SELECT DISTINCT score FROM {table};", ["row", "column", "spill"]),
+    "aggregate": ("SELECT grp, COUNT(*), SUM(id), MAX(score) FROM {table} GROUP BY grp;", ["row", "column"]),
+    "minmax": ("SELECT MIN(score), MAX(score) FROM {table};", ["row", "index:score"]),
+}
+
+
+def bench_query(query, variants):
+    # every variant gets its own table in one database, built before anything is timed
+    for rows in SIZES:
+        with ExitStack() as stack:
+            steps = []
+            for variant in variants:
+                kind, _, index = variant.partition(":")
+                table = "bench_" + variant.replace(":", "_")
+                conn = stack.enter_context(filled(rows, kind == "column", index or None, table))
+                def step(conn=conn, table=table, memory=SPILL_MEMORY if kind == "spill" else None):
+                    with budget(memory):
+                        return conn.execute(query.format(table=table, quarter=rows // 4)).fetchall()
+                steps.append((variant, step))
+            run(rows, steps, same=True)
+
+
+def bench_parse():
+    # tokenizing a multi-row INSERT, and running one statement many times
+    # with its plan cached against parsing it every time
+    for rows in SIZES:
+        query = insert_statement("bench", rows)
+        run(rows, [("tokenize multi-row INSERT", lambda: project.tokenize(query))])
+        with filled(rows, index="id") as conn:
+            select = "SELECT * FROM bench WHERE id = 5;"  # an index lookup, so parsing shows
+            def uncached():
+                results = []
+                for i in range(100):
+                    conn.db().statement_cache().clear()
+                    results.append(conn.execute(select).fetchall())
+                return results
+            run(rows, [("100 SELECTs, cached plan", lambda: [conn.execute(select).fetchall() for i in range(100)]),
+                       ("100 SELECTs, parsed", uncached)], same=True)
+
+
+def bench_insert():
+    # the ways rows get into a table, each into its own indexed table
+    for rows in SIZES:
+        conn = project.connect(":memory:")
+        values = bench_values(rows)
+
+        def into(name, fn):
+            # a step that creates table name, runs fn and returns the rows the table ends up with
+            conn.execute(f"CREATE TABLE {name} (grp INTEGER, id INTEGER, score REAL);")
+            conn.execute(f"CREATE INDEX {name}_id ON {name} (id);")
+            def step():
+                fn()
+                return conn.db().grab_table(name).count()
+            return step
+
+        def per_row():
+            for row in values:
+                conn.execute("INSERT INTO per_row VALUES (?, ?, ?);", row)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.csv")
+            with open(path, "w") as fp:
+                fp.write("grp,id,score\n" + "".join(f"{grp},{i},{score}\n" for grp, i, score in values))
+            statement = insert_statement("statement", rows)
+            run(rows, [
+                ("INSERT statement", into("statement", lambda: conn.execute(statement))),
+                ("executemany", into("many", lambda: conn.executemany("INSERT INTO many VALUES (?, ?, ?);", values))),
+                ("execute per row", into("per_row", per_row)),
+                ("load_rows", into("rows", lambda: conn.load_rows("rows", values))),
+                ("load_csv", into("csv", lambda: conn.load_csv("csv", path))),
+            ], same=True)
+        forget(":memory:")
+
+
+def bench_join():
+    # the joins are generators, list() runs them to the end
+    for rows in SIZES:
+        left = [(i, f"name {i}") for i in range(rows)]
+        right = [(i, i * 0.5) for i in range(rows - 1, -1, -1)]
+        steps = [("hash join", lambda: list(project.hash_join(left, right, 0, 0, 2))),
+                 ("chosen join", lambda: list(project.join_rows(left, right, 0, 0, 2)))]
+        if rows <= NESTED_LOOP_ROWS:
+            steps.insert(0, ("nested loop join", lambda: list(project.nested_loop_join(left, right, 0, 0, 2))))
+        run(rows, steps, same=True)
+
+
+def bench_writes():
+    # writes that touch a few rows, through an index. their cost should not follow table size,
+    # a transaction's snapshot is copied on write and DELETE only leaves tombstones
+    for rows in SIZES:
+        for columnar in (False, True):
+            with filled(rows, columnar, "id") as conn:
+                def transaction():
+                    conn.execute("BEGIN TRANSACTION;")
+                    conn.execute("INSERT INTO bench VALUES (0, -1, 0.5);")
+                    conn.execute("COMMIT TRANSACTION;")
+                deletes = [f"DELETE FROM bench WHERE id = {i};" for i in range(0, rows, rows // 100)]
+                store = "column" if columnar else "row"
+                run(rows, [
+                    (f"BEGIN/INSERT/COMMIT ({store})", transaction),
+                    (f"UPDATE one row ({store})", lambda: conn.execute("UPDATE bench SET score = 1.5 WHERE id = 7;")),
+                    (f"100 DELETEs ({store})", lambda: [conn.execute(q) for q in deletes]),
+                    (f"VACUUM ({store})", lambda: conn.execute("VACUUM;")),
+                ])
+
+
+def bench_files():
+    # a file with 8 tables: a logged INSERT and a checkpoint, then writing the file on
+    # close and opening it again eagerly and lazily for a query on one table
+    query = "SELECT * FROM bench3 WHERE id = 5;"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+
+        def reopen(lazy):
+            forget(path)
+            return project.connect(path, lazy=lazy).execute(query).fetchall()
+
+        for rows in SIZES:
+            conn = project.connect(path)
+            for t in range(8):
+                conn.execute(f"CREATE TABLE bench{t} (grp INTEGER, id INTEGER, score REAL);")
+                conn.executemany(f"INSERT INTO bench{t} VALUES (?, ?, ?);", bench_values(rows))
+            run(rows, [
+                ("logged INSERT", lambda: conn.execute("INSERT INTO bench0 VALUES (0, -1, 0.5);")),
+                ("checkpoint", conn.checkpoint),
+                ("close (write)", conn.close),
+            ])
+            run(rows, [("connect + query", lambda: reopen(False)), ("lazy connect + query", lambda: reopen(True))],
+                same=True, memory=True)
+            forget(path)
+            os.remove(path)
+
+
+def bench_memory():
+    # bytes per row each store reports, and the peak a full scan allocates
+    # when it is fetched at once or a page at a time
+    def page_through(conn):
+        cursor = conn.execute("SELECT * FROM bench;")
+        while cursor.fetchmany(1000):
+            pass
+
+    for rows in SIZES:
+        for columnar in (False, True):
+            with filled(rows, columnar) as conn:
+                store = "column" if columnar else "row"
+                per_row = conn.memory_report()["bench"]["per_row"]
+                print(f"{store + ' store':>28} {rows:>8} rows {per_row:8.1f}B/row reported")
+                run(rows, [(f"fetchall ({store})", lambda: conn.execute("SELECT * FROM bench;").fetchall()),
+                           (f"fetchmany(1000) ({store})", lambda: page_through(conn))], memory=True)
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "insert": bench_insert,
+    "join": bench_join,
+    "writes": bench_writes,
+    "files": bench_files,
+    "memory": bench_memory,
+}
+for name, (query, variants) in QUERIES.items():
+    BENCHMARKS[name] = lambda query=query, variants=variants: bench_query(query, variants)
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"unknown benchmark {name}, choose from: {', '.join(BENCHMARKS)}")
+        print(f"== {name}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,40 @@
 
 _ALL_DATABASES = {}
 _LOCKS = {}
+_WALS = {}  # key = filename, value = WriteAheadLog shared by its connections
+_CURSORS = {}  # key = filename, value = WeakSet of cursors still pulling rows from it
 # locks map:
 # key   : filename
 # value : {0:0, 1:0, 2:0, 3:0}
-
-import string, copy
+_STATEMENT_CACHE_SIZE = 128  # parsed statements kept per database
+_STREAM_INSERT_SIZE = 65536  # INSERT statements at least this long are streamed
+_INSERT_BATCH_SIZE = 1024    # rows handed to a table at once
+_LOAD_BATCH_SIZE = 8192      # rows type checked and appended at once by a bulk load
+_PAGE_ROWS = 256             # rows per RowStore page, the unit copied on write
+_BATCH_ROWS = 2048           # rows per ColumnStore chunk, the unit scanned in a batch and copied on write
+_INDEX_CHUNK = 256           # distinct values per Index shard and sorted keys chunk, the units copied on write
+_COMPACT_RATIO = 0.5         # share of a table's slots that may be deleted rows before it is compacted
+_WAL_CHECKPOINT_SIZE = 1 << 22  # log bytes that trigger a checkpoint
+_NO_WAL = (':memory:', '')      # filenames that are never logged
+_WRITES = ('INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'VACUUM')  # statements that change tables
+_FILE_PAGE_ROWS = 4096       # values per column page in a .db file
+_SORT_MEMORY = 64 << 20      # bytes of rows a sort holds before spilling sorted runs to disk
+_DISTINCT_MEMORY = 64 << 20  # bytes of distinct rows kept in a set before spilling to disk
+_DISTINCT_PARTITIONS = 16    # spill files the rows are hashed into once DISTINCT spills
+_SPILL_ROWS = 1024           # rows per pickled chunk in a spill file
+_HASH_BUILD_COST = 4         # rough cost of hashing one row, relative to one comparison
+
+import copy, re, sys, os, mmap, struct, zlib, weakref, heapq, pickle, tempfile, csv, time
+from array import array
 from operator import itemgetter
+from collections import OrderedDict
+from itertools import chain, islice, compress, repeat
+from operator import eq, ne, lt, gt, le, ge, and_, or_, not_
+from bisect import bisect_left, bisect_right
 import xml.etree.ElementTree as et
 
 class Connection(object):
-    def __init__(self, filename):
+    def __init__(self, filename, columnar=False, lazy=False):
         self.__filename = filename
         if filename in _ALL_DATABASES:
             self.__db = _ALL_DATABASES[filename]
@@ -21,6 +45,11 @@ class Connection(object):
         self.__transmode = 0
         self.__lock = 0
         self.__copy = None
+        self.__columnar = columnar  # new tables use column storage
+        self.__lazy = lazy          # tables stay in the file until first used
+        self.__pending = []         # statements of the open transaction, logged on commit
+        self.__replaying = False    # True while recovering from the log
+        self.__rejected = []        # (row, reason) for rows the last INSERT, UPDATE or load left out
 
         self.open(filename)  # attempts to open the filename
 
@@ -35,6 +64,15 @@ class Connection(object):
     
     def lock(self):
         return self.__lock
+
+    def columnar(self):
+        return self.__columnar
+
+    def cache_hits(self):
+        return self.__db.statement_cache().hits()
+
+    def cache_misses(self):
+        return self.__db.statement_cache().misses()
     
     def save(self):
         if self.__filename in _ALL_DATABASES:
@@ -58,6 +96,7 @@ class Connection(object):
 
         self.__transmode = tmode
         self.__copy = self.__db.copy()
+        self.__pending = []
 
         if self.__filename not in _LOCKS:
             _LOCKS[self.__filename] = {0:0, 1:0, 2:0, 3:0}
@@ -71,16 +110,89 @@ class Connection(object):
 
     def commit_transaction(self):
         if self.__lock == 3:
-            self.__db = self.__copy.copy()
+            # the transaction's copy becomes the database, nothing else refers to it
+            self.__db = self.__copy
+            self.__copy = None
+            self.log(self.__pending)  # the whole transaction is one log record
+        self.__pending = []
         self.__transmode = 0
         _LOCKS[self.__filename][self.__lock] -= 1
         self.__lock = 0
 
     def rollback_transaction(self):
+        self.__pending = []
         self.__transmode = 0
         _LOCKS[self.__filename][self.__lock] -= 1
         self.__lock = 0
 
+    def wal(self) -> 'WriteAheadLog':
+        # the log shared by every connection to this file, None for in-memory databases
+        if self.__filename in _NO_WAL:
+            return None
+        if self.__filename not in _WALS:
+            _WALS[self.__filename] = WriteAheadLog(self.__filename + '-wal')
+        return _WALS[self.__filename]
+
+    def record(self, statement, params: list = None):
+        # a statement that changed the database, logged now or when its transaction commits.
+        # params : the rows of values bound to its placeholders, None if it has none
+        if self.get_tmode() != 0:
+            self.__pending.append((statement, params))
+        else:
+            self.log([(statement, params)])
+
+    def log(self, statements):
+        """
+        Appends committed (statement, params) pairs to the write-ahead log as one record.
+        A log needs a main file to build on, if there isn't one yet (or it
+        predates the log) a checkpoint writes it instead.
+        """
+        wal = self.wal()
+        if not wal or not statements or self.__replaying:
+            return
+        if wal.salt() == None:
+            self.checkpoint()  # the main file now holds these statements
+            return
+        wal.append(statements)
+        if wal.size() >= _WAL_CHECKPOINT_SIZE:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Writes the whole database to its file and empties the log.
+        Main file and log share a random salt, so a log left over from an older
+        main file is never replayed on top of a newer one
+        """
+        filename = self.filename()
+        salt = int.from_bytes(os.urandom(8), 'little') | 1
+
+        # write next to the file and swap it in, so a failed write can't destroy the old one
+        tmpname = filename + '.tmp'
+        with open(tmpname, 'wb') as fp:
+            write_database(self.db(), fp, salt)
+        os.replace(tmpname, filename)
+        if self.wal():
+            self.wal().reset(salt)
+
+    def recover(self, salt):
+        """
+        Replays the committed statements left in the log by a session that never
+        closed. salt is the main file's salt, None if there is no binary main file
+        """
+        wal = self.wal()
+        if not wal:
+            return
+        self.__replaying = True
+        try:
+            for statements in wal.recover(salt):
+                for statement, params in statements:
+                    if params:
+                        self.executemany(statement, params)
+                    else:
+                        self.execute(statement)
+        finally:
+            self.__replaying = False
+
     def set_lock(self, lock):
         #print(f"currlock: {self.__lock}\nsetlock:  {lock}\n_LOCKS: {_LOCKS}")
         if self.__lock >= lock: # setting lock to 0 is done in commit_transaction
@@ -107,55 +219,75 @@ class Connection(object):
 
 
 
-    def execute(self, statement):
+    def cursor(self) -> 'Cursor':
+        return Cursor(self)
+
+    def execute(self, statement, params=()):
         """
-        Takes a SQL statement.
-        Returns a list of tuples (empty unless select statement
+        Takes a SQL statement, and values for its ? placeholders if it has any.
+        Returns a Cursor over its rows (empty unless select statement
         with rows to return).
         """
+        return self.cursor().execute(statement, params)
 
-        def cond_met(cond, entry):
-            """
-            'WHERE' helper function.
-
-            given a condition, returns true if value meets condition.
-            returns false if condition is not met.
-
-            structure of cond:
-                [column_index, operator, test_value]
-            """
-            i, op, test_val = cond
-
-            if not entry[i] and test_val:
-                return False
+    def detach_cursors(self):
+        # the database is about to change, open cursors keep the rows they were going to return
+        for cursor in list(_CURSORS.get(self.__filename, ())):
+            cursor.detach()
 
-            if op == '=':
-                return True if entry[i] == test_val else False
-            if op == '!=':
-                return True if entry[i] != test_val else False
-            if op == '>':
-                return True if entry[i] >  test_val else False
-            if op == '<':
-                return True if entry[i] <  test_val else False
-            return False
+    def run(self, statement, steps: list = None, params=(), many=None):
+        """
+        Runs a SQL statement.
+        Returns an iterator over its rows, a SELECT's rows are pulled from its
+        pipeline as the iterator is read.
+
+        steps  : if given, a SELECT appends a line describing each way it reads
+                 or reorders rows (what EXPLAIN QUERY PLAN shows)
+        params : values for the statement's ? placeholders
+        many   : for an INSERT, an iterable of parameter rows, the VALUES are
+                 added once per row in a single batched insert (see executemany)
+        """
 
-        def where(data, cond):
+        def where(table, tree, cols):
             """
-            'WHERE' helper function. Takes in data and returns a list of indexes
-            where each index is a row that matches the condition.
+            'WHERE' helper function. Returns the set of indexes of the rows of
+            table that match the condition, in a single pass over the table.
 
-            data    : the rows to test          [row1, row2, ...]
-            cond    : the condition to test     [column_index, operator, test_value]
-            return  : list of indexes
+            table   : the table to test
+            tree    : the parsed condition      (see PREDICATES)
+            cols    : the table's column names, in row order
+            return  : set of indexes
             """
-            winds = []
-            i = 0
-            for row in data:
-                if cond_met(cond, row):
-                    winds.append(i)
-                i += 1
-            return winds
+            tree = apply_affinity(tree, cols, table.grab_col_types())
+            test = compile_predicate(tree, cols)
+            cond = index_condition(tree, table, cols)
+            if cond:
+                # the index narrows down the candidates, the predicate still has the final say
+                index, op, value = cond
+                return {i for i in index.lookup(op, value) if test(table.grab_row(i))}
+
+            if table.columnar():
+                # whole column pages at a time
+                batch = compile_batch(tree, cols)
+                winds = set()
+                start = 0
+                for columns in table.iter_batches(live=False):
+                    end = start + len(columns[0])
+                    winds.update(compress(range(start, end), batch(columns)))
+                    start = end
+                return winds - table.tombstones()
+
+            return {i for i, row in table.iter_items() if test(row)}
         
+        explain = re.match(r'\s*EXPLAIN(\s+QUERY\s+PLAN)?\s+', statement)
+        if explain:
+            # the SELECT's pipeline is built but never pulled from, so nothing is read
+            if not statement[explain.end():].startswith('SELECT'):
+                raise Exception("only SELECT statements can be explained")
+            steps = []
+            self.run(statement[explain.end():], steps)
+            return [(i, 0, 0, steps[i]) for i in range(len(steps))]
+
         dbname = self.filename()
         if dbname in _ALL_DATABASES:
             self.load()  # grabs updated database if another transaction updated it
@@ -168,8 +300,26 @@ class Connection(object):
         else:
             db = self.db()
             t = False
-        tokens = tokenize(statement)  # will auto-qualify columns to tables
+        if (len(statement) >= _STREAM_INSERT_SIZE and statement.lstrip().startswith('INSERT')
+                and many == None and not params and '?' not in statement):
+            # bulk inserts are streamed straight from the text, no token list and no caching.
+            # one with placeholders is parsed as usual, so they are bound or refused up front
+            if t:
+                self.set_lock(2)
+            self.detach_cursors()
+            self.insert_rows(db, scan(statement))
+            self.save()
+            self.record(statement)
+            return []
+
+        plan = db.statement_cache().get(statement)  # parsed once per distinct statement
+        if many == None and (params or plan.slots()):
+            plan = plan.bind(params)
+        tokens = plan.tokens()  # will auto-qualify columns to tables
         lock = self.lock()
+        checkpoint = False  # True when the change is saved by a checkpoint instead of logged
+        if tokens[0] in _WRITES:
+            self.detach_cursors()
 
         ##################################################
         ##########            BEGIN             ##########
@@ -204,6 +354,17 @@ class Connection(object):
             self.rollback_transaction()
             data = []
 
+        ##################################################
+        ##########            VACUUM            ##########
+        ##################################################
+        elif tokens[0] == 'VACUUM':
+            if t:
+                raise Exception("cannot VACUUM from within a transaction")
+            db.vacuum()
+            if self.wal():
+                self.checkpoint()  # the file is rewritten without the deleted rows too
+            data = []
+
         ##################################################
         ##########         CREATE VIEW          ##########
         ##################################################
@@ -211,16 +372,25 @@ class Connection(object):
             i = statement.index('AS') + 3
             viewstatement = statement[i:]
             viewname = tokens[2]
-            vtokens = tokenize(viewstatement)
+            vplan = db.statement_cache().get(viewstatement)
+            vtokens = vplan.tokens()
 
             cols = []
-            i = 1
+            i = 1 + vplan.has('DISTINCT')
             while True:
-                t,c = vtokens[i].split('.')
+                item, i = parse_item(vtokens, i)
+                if not isinstance(item, str):
+                    # an aggregate, named after its sql like sqlite does
+                    cols.append(f"{item[0]}({item[1][item[1].find('.')+1:]})")
+                    if vtokens[i+1] == ',':
+                        i += 2
+                        continue
+                    break
+                t,c = item.split('.')
                 if c == '*':
                     cols += db.grab_table(t).grab_col_names()
-                    if 'LEFT' in vtokens:
-                        othername = vtokens[vtokens.index('JOIN')+1]
+                    if vplan.has('LEFT'):
+                        othername = vtokens[vplan.index('JOIN')+1]
                         cols += db.grab_table(othername).grab_col_names()
                 else:
                     cols.append(c)
@@ -239,8 +409,8 @@ class Connection(object):
         ##########         CREATE TABLE         ##########
         ##################################################
         elif tokens[0] == 'CREATE' and tokens[1] == 'TABLE':
-            name = tokens[2 + ((int('EXISTS' in tokens)) * 3)]
-            if 'EXISTS' in tokens:
+            name = tokens[2 + ((int(plan.has('EXISTS'))) * 3)]
+            if plan.has('EXISTS'):
                 if db.grab_table(name):
                     return []
 
@@ -262,17 +432,44 @@ class Connection(object):
                     continue
                 break
         
-            table = Table(cols, types, defaults)
+            table = Table(cols, types, defaults, self.columnar())
             db.create_table(name, table)
             data = []
 
         
+        ##################################################
+        ##########         CREATE INDEX         ##########
+        ##################################################
+        elif tokens[0] == 'CREATE' and tokens[1] == 'INDEX':
+            i = 2 + (int(plan.has('EXISTS')) * 3)
+            name = tokens[i]
+            if plan.has('EXISTS'):
+                if db.grab_index(name):
+                    return []
+            tname = tokens[i+2]
+            col = tokens[i+4]
+            if tokens[i+5] != ')':
+                raise Exception(f"index {name} lists more than one column, only single column indexes are supported")
+            db.create_index(name, tname, col[col.find('.')+1:])
+            data = []
+
+        ##################################################
+        ##########          DROP INDEX          ##########
+        ##################################################
+        elif tokens[0] == 'DROP' and tokens[1] == 'INDEX':
+            name = tokens[2 + (int(plan.has('EXISTS'))*2)]
+            if plan.has('EXISTS'):
+                if db.grab_index(name) == None:
+                    return []
+            db.remove_index(name)
+            data = []
+
         ##################################################
         ##########             DROP             ##########
         ##################################################
         elif tokens[0] == 'DROP':
-            name = tokens[2 + (int('EXISTS' in tokens)*2)]
-            if 'EXISTS' in tokens:
+            name = tokens[2 + (int(plan.has('EXISTS'))*2)]
+            if plan.has('EXISTS'):
                 if db.grab_table(name) == None:
                     return []
             db.remove_table(name)
@@ -286,50 +483,17 @@ class Connection(object):
             if t:
                 self.set_lock(2)
 
-            name = tokens[2]
-            table_cols = db.grab_table(name).grab_col_names()
-
-            # INSERT can now take incomplete rows and out-of-order rows as queries
-            # STEP 1: define a default row with all default values
-            default_row = db.grab_table(name).grab_defaults()
-            # STEP 2: if complex, cols holds a list of integers representing the data's final position in a row
-            #         if not, cols holds the range of all columns (0 to end order)
-            #         if inserting default values, add default row
-
-            if tokens[3] == 'DEFAULT':
-                # just add the default row
-                db.grab_table(name).add_row(default_row)
+            if many != None:
+                # the rows are only kept when the log will need them. outside a transaction
+                # more than _INSERT_BATCH_SIZE of them are saved by a checkpoint instead, like
+                # a bulk load, so a large executemany isn't held twice or logged in one record
+                params = [] if self.wal() else None
+                limit = _INSERT_BATCH_SIZE if self.get_tmode() == 0 and not self.__replaying else None
+                self.insert_rows(db, bind_rows(plan, many, params, limit))
+                checkpoint = limit != None and params != None and len(params) > limit
             else:
-                if tokens[3] == '(':
-                    # complexity check
-                    i = 4
-                    cols = []
-                    while True:
-                        cols.append(table_cols.index(tokens[i]))
-                        if tokens[i+1] == ',':
-                            i += 2
-                            continue
-                        break
-                else:
-                    cols = [i for i in range(len(table_cols))]
-
-                # STEP 3: When iterating through a 'row' from tokens, load in a default_row
-                #         iterate with each column index in cols, set to the value in tokens
-                #         final row will have everything in the correct order, and any columns not defined are default values
-
-                i = tokens.index('VALUES') + 2
-                while True:
-                    row = default_row
-                    for j in cols:
-                        row[j] = tokens[i]
-                        i += 2
-                    db.grab_table(name).add_row(row)
-
-                    # check if we have another row to add
-                    if tokens[i] == ',':
-                        i += 2
-                        continue
-                    break
+                self.insert_rows(db, iter(tokens))
+                params = [params] if params else None
             data = []
 
         
@@ -339,140 +503,212 @@ class Connection(object):
         elif tokens[0] == 'SELECT':
             if t:
                 self.set_lock(1)
-            name = tokens[tokens.index('FROM') + 1]
+            if steps == None:
+                steps = []
+            name = tokens[plan.index('FROM') + 1]
             view = False
             if name in db.views():
                 view = True
             
-            distinct = True if 'DISTINCT' in tokens else False
-            maxagg = True if 'MAX' in tokens else False
-            minagg = True if 'MIN' in tokens else False
-            orderdir = True if 'DESC' in tokens else False
-            name = tokens[tokens.index('FROM') + 1]
+            source = None
+            distinct = True if plan.has('DISTINCT') else False
+            name = tokens[plan.index('FROM') + 1]
 
-            # STEP 1: Get variables for our data and our columns.
+            # STEP 1: Get variables for our rows and our columns.
             #         if JOIN, we need to implement our join to our variables
 
-            if 'JOIN' in tokens:
+            if plan.has('JOIN'):
                 #here we go
-                name2 = tokens[tokens.index('JOIN') + 1]
+                name2 = tokens[plan.index('JOIN') + 1]
                 t1cols = db.grab_table(name).grab_qcol_names(name)
                 t1offset = len(t1cols)
                 t2cols = db.grab_table(name2).grab_qcol_names(name2)
                 table_cols = t1cols + t2cols
-                i = tokens.index('ON') + 1
+                table_types = db.grab_table(name).grab_col_types() + db.grab_table(name2).grab_col_types()
+                i = plan.index('ON') + 1
                 t1c = table_cols.index(tokens[i])
                 t2c = table_cols.index(tokens[i+2])
 
-                # ok lets actually LEFT OUTER JOIN now
-                # could be more efficient but dont care
-
+                # LEFT OUTER JOIN, each left row takes every matching right row
                 data1 = db.grab_table(name).grab_rows()
                 data2 = db.grab_table(name2).grab_rows()
-                initdata = []
-                for ri in data1:
-                    finalrow = list(ri)
-                    match = False
-                    for rj in data2:
-                        if finalrow[t1c] == rj[t2c - t1offset]:
-                            match = True
-                            finalrow += list(rj)
-                            break
-                    if not match:
-                        finalrow += [None for c in data2[0]]
-                    initdata.append(tuple(finalrow))
+                rows = join_rows(data1, data2, t1c, t2c - t1offset, len(t2cols))
+                steps += [f'SCAN {name}', f'SCAN {name2}']
                 
             else:
                 if view:
                     vstatement = db.grab_table(name).statement()
-                    initdata = self.execute(vstatement)
+                    rows = self.run(vstatement, steps)
+                    steps.append(f'SCAN {name}')
+                    table_types = None  # a view's columns have no affinity
                 else:
-                    initdata = db.grab_table(name).grab_rows()
+                    source = db.grab_table(name)  # rows line up with the table, its indexes can be used
+                    rows = scan_rows(source)
+                    table_types = source.grab_col_types()
                 table_cols = db.grab_table(name).grab_qcol_names(name)
 
-            # grab return columns from query
+            # grab return columns from query, each a column name or an (aggregate, column) pair
             cols = []
-            i = 1 + distinct + (2 * ((maxagg) + (minagg)))
+            i = 1 + distinct
             while True:
-                t,c = tokens[i].split('.')
-                if c == '*':
+                item, i = parse_item(tokens, i)
+                if isinstance(item, str) and item.split('.')[1] == '*':
+                    t = item.split('.')[0]
                     cols += db.grab_table(t).grab_qcol_names(t)
-                    if 'JOIN' in tokens:
-                        othername = tokens[tokens.index('JOIN')+1]
+                    if plan.has('JOIN'):
+                        othername = tokens[plan.index('JOIN')+1]
                         cols += db.grab_table(othername).grab_qcol_names(othername) 
                 else:
-                    cols.append(tokens[i])
+                    cols.append(item)
                 if tokens[i+1] == ',':
                     i += 2
                     continue
                 break
 
-            order = []
-            i = tokens.index('BY') + 1
-            while True:
-                order.append(tokens[i])
-                if tokens[i+1] == ',':
-                    i += 2
-                    continue
-                break
+            groups = []  # GROUP BY columns
+            if plan.has('GROUP'):
+                i = plan.index('GROUP') + 2
+                while True:
+                    groups.append(tokens[i])
+                    if tokens[i+1] == ',':
+                        i += 2
+                        continue
+                    break
+            having = plan.having() if plan.has('HAVING') else None
 
-            # Return all data (where clause first), but you only show the selected columns.
-            # You can order by a column you have not selected.
-            # The idea: First grab all data, and sort the rows by order by.
-            # If aggregate, return one row.
-            # Place the sorted data in column dictionary. Pull only the columns selected.
-                
-            if 'WHERE' in tokens:
-                i = tokens.index('WHERE')
-                col = table_cols.index(tokens[tokens.index('WHERE') + 1])
-                op = tokens[i+2]
-                tval = tokens[i+3]
-                winds = where(initdata, [col, op, tval])
-                data = []
-                for i in range(len(initdata)):
-                    if i in winds:
-                        data.append(initdata[i])
-            else:
-                data = initdata
-
-            # order in reverse so the first order column is the 'primary' order
-            for i in range(len(order)-1, -1, -1):
-                data.sort(key=itemgetter(table_cols.index(order[i])), reverse=orderdir)
-
-            # make a dictionary of the sorted items so we can grab only the selected columns
-
-            cd = {}
-            for i in range(len(table_cols)):
-                coldata = []
-                for j in range(len(data)):
-                    coldata.append(data[j][i])
-                cd[table_cols[i]] = coldata
-
-            # grab only selected columns
-
-            data2 = []
-            for i in range(len(data)):
-                entry = []
-                for j in range(len(cols)):
-                    entry.append(cd[cols[j]][i])
-                data2.append(tuple(entry))
-
-            # if aggregate, set data to aggregate
-            if maxagg:
-                data = [tuple(max(data2))]
-            elif minagg:
-                data = [tuple(min(data2))]
-            else:
-                # remove duplicates if DISTINCT and return
-                
-                if distinct:
-                    data = []
-                    for row in data2:
-                        if row not in data:
-                            data.append(row)
+            order = []       # columns (or aggregates) to sort on
+            descending = []  # True for each DESC column
+            if plan.has('ORDER'):
+                i = plan.index('ORDER') + 2
+                while True:
+                    item, i = parse_item(tokens, i)
+                    order.append(item)
+                    descending.append(tokens[i+1] == 'DESC')
+                    if tokens[i+1] in ('ASC', 'DESC'):
+                        i += 1
+                    if tokens[i+1] == ',':
+                        i += 2
+                        continue
+                    break
+
+            # LIMIT count [OFFSET skip], or LIMIT skip, count. a negative count means no limit
+            limit = None
+            offset = 0
+            if plan.has('LIMIT'):
+                i = plan.index('LIMIT')
+                limit = tokens[i+1]
+                if i + 3 < len(tokens) and tokens[i+2] == 'OFFSET':
+                    offset = tokens[i+3]
+                elif i + 3 < len(tokens) and tokens[i+2] == ',':
+                    offset, limit = limit, tokens[i+3]
+                if limit < 0:
+                    limit = None
+
+            # STEP 2: Stack the operators, each one pulls rows from the one below it.
+            #         You can order by a column you have not selected, so sorting
+            #         happens on whole rows before the selected columns are projected.
+            #         Aggregates first turn the rows into one row per group, made of the
+            #         aggregate values followed by a row of the group, and HAVING,
+            #         ORDER BY and the selected columns all refer to that row.
+            #         A sorted index can stand in for reading the rows (MIN and MAX)
+            #         or for sorting them (ORDER BY on the indexed column).
+
+            items = cols + order + (tree_columns(having) if having else [])
+            aggs = []  # every aggregate the query uses, as (function, column position)
+            for item in items:
+                if not isinstance(item, str) and aggregate_key(item, table_cols) not in aggs:
+                    aggs.append(aggregate_key(item, table_cols))
+            grouped = aggs or groups or having
+            tree = plan.where() if plan.has('WHERE') else None
+            if tree != None and table_types:
+                tree = apply_affinity(tree, table_cols, table_types)
+
+            for item in order:
+                if isinstance(item, str):
+                    column_position(table_cols, item)  # raises for a bad column even when no sort runs below
+
+            ends = None
+            if source and tree == None and not groups and not having:
+                ends = index_aggregates(source, cols, table_cols)
+            if ends:
+                # the first and last keys of the indexes are the whole answer
+                for fn, index in ends:
+                    steps.append(f'SEARCH {name} USING INDEX {index.name()} FOR {fn}')
+                rows = iter([tuple(index.smallest() if fn == 'MIN' else index.largest() for fn, index in ends)])
+                if limit != None or offset:
+                    rows = limit_rows(rows, limit, offset)
+                return rows
+
+            ordering = None  # an index that already has the rows in ORDER BY order
+            if source and len(order) == 1 and isinstance(order[0], str) and not grouped:
+                ordering = source.grab_index(column_position(table_cols, order[0]))
+
+            if tree != None:
+                cond = index_condition(tree, source, table_cols) if source else None
+                if cond and ordering and cond[0] is not ordering and cond[1] == '=':
+                    ordering = None  # narrowing the rows down with the other index beats reading them all
+                elif cond and ordering and (cond[0] is not ordering or cond[1] == '!='):
+                    cond = None      # a range or != may match most rows, like sqlite just read them in order
+                if cond:
+                    # the index narrows down the candidates, the predicate still has the final say
+                    index, op, value = cond
+                    if ordering:
+                        positions = index.ordered(descending[0], op, value)
+                    else:
+                        positions = index.lookup(op, value)
+                    rows = filter_rows(index_scan(source, positions), compile_predicate(tree, table_cols))
+                    column = source.grab_col_names()[index.column()]
+                    steps.append(f'SEARCH {name} USING INDEX {index.name()} ({column}{op}?)')
+                elif ordering:
+                    rows = filter_rows(index_scan(source, ordering.ordered(descending[0])),
+                                       compile_predicate(tree, table_cols))
+                    steps.append(f'SCAN {name} USING INDEX {ordering.name()}')
+                elif source and source.columnar():
+                    rows = filter_batches(source.iter_batches(), compile_batch(tree, table_cols))
+                    steps.append(f'SCAN {name}')
                 else:
-                    data = data2
-            return data
+                    rows = filter_rows(rows, compile_predicate(tree, table_cols))
+                    if source:
+                        steps.append(f'SCAN {name}')
+            elif ordering:
+                rows = index_scan(source, ordering.ordered(descending[0]))
+                steps.append(f'SCAN {name} USING INDEX {ordering.name()}')
+            elif source:
+                steps.append(f'SCAN {name}')
+
+            if grouped:
+                def locate(item):
+                    # position of a column or aggregate in an aggregated row
+                    if isinstance(item, str):
+                        return len(aggs) + column_position(table_cols, item)
+                    return aggs.index(aggregate_key(item, table_cols))
+                rows = aggregate_rows(rows, [column_position(table_cols, g) for g in groups], aggs, len(table_cols))
+                if groups:
+                    steps.append('USE HASH TABLE FOR GROUP BY')
+                if having:
+                    width = len(aggs) + len(table_cols)
+                    rows = filter_rows(rows, compile_predicate(map_columns(having, locate), list(range(width))))
+            else:
+                def locate(item):
+                    return column_position(table_cols, item)
+
+            # without GROUP BY an aggregate query has a single row, its ORDER BY changes nothing
+            if order and not ordering and not (grouped and not groups):
+                # when nothing after the sort drops rows, only the first offset + limit need sorting
+                top = None
+                if limit != None and not distinct:
+                    top = offset + limit
+                rows = sort_rows(rows, [locate(c) for c in order], descending, top)
+                steps.append('SORT FOR ORDER BY' if top == None else f'TOP {top} SORT FOR ORDER BY')
+
+            rows = project_rows(rows, [locate(c) for c in cols])
+
+            if distinct:
+                rows = distinct_rows(rows)
+                steps.append('USE HASH TABLE FOR DISTINCT')
+            if limit != None or offset:
+                rows = limit_rows(rows, limit, offset)
+            return rows
 
 
         ##################################################
@@ -485,19 +721,12 @@ class Connection(object):
             name = tokens[1]
             cols = db.grab_table(name).grab_col_names()
 
-            if 'WHERE' not in tokens:
-                winds = [i for i in range(len(cols))]
+            if not plan.has('WHERE'):
+                winds = db.grab_table(name).positions()
             else:
-                i = tokens.index('WHERE')
-                qcol = tokens[tokens.index('WHERE') + 1]
-                qcol = qcol[qcol.index('.')+1:]
-                col = cols.index(qcol)
-                op = tokens[i+2]
-                tval = tokens[i+3]
-                data = db.grab_table(name).grab_rows()
-                winds = where(data, [col, op, tval])
+                winds = where(db.grab_table(name), plan.where(), cols)
             
-            i = tokens.index('SET') + 1
+            i = plan.index('SET') + 1
             sets = []
             while True:
                 col = cols.index(tokens[i])
@@ -508,7 +737,7 @@ class Connection(object):
                     continue
                 break
 
-            db.grab_table(name).update(sets, winds)
+            self.__rejected = db.grab_table(name).update(sets, winds)
             data = []
 
 
@@ -519,122 +748,341 @@ class Connection(object):
             if t:
                 self.set_lock(2)
             
-            name = tokens[tokens.index('FROM') + 1]
+            name = tokens[plan.index('FROM') + 1]
             cols = db.grab_table(name).grab_col_names()
-            if 'WHERE' not in tokens:
+            if not plan.has('WHERE'):
                 db.grab_table(name).clear()
             else:
-                i = tokens.index('WHERE')
-                qcol = tokens[tokens.index('WHERE') + 1]
-                qcol = qcol[qcol.index('.')+1:]
-                col = cols.index(qcol)
-                op = tokens[i+2]
-                tval = tokens[i+3]
-                data = db.grab_table(name).grab_rows()
-                winds = where(data, [col, op, tval])
+                winds = where(db.grab_table(name), plan.where(), cols)
                 db.grab_table(name).delete(winds)
             data = []
 
         self.save()
+        if checkpoint:
+            self.checkpoint()
+        elif tokens[0] in ('INSERT', 'UPDATE', 'DELETE', 'DROP') or (tokens[0] == 'CREATE' and tokens[1] != 'VIEW'):
+            if tokens[0] != 'INSERT':
+                params = [params] if params else None
+            self.record(statement, params)  # views are not saved, so they are not logged either
         return data
     
+    def insert_rows(self, db, tokens):
+        """
+        INSERT helper. Pulls tokens from an iterator and hands finished rows to
+        the table in batches, so at most one batch of rows is held in memory.
+
+        db      : the database to insert into
+        tokens  : iterator over the tokens of an INSERT statement
+        """
+        next(tokens)  # INSERT
+        next(tokens)  # INTO
+        name = next(tokens)
+        table = db.grab_table(name)
+        table_cols = table.grab_col_names()
+
+        # INSERT can take incomplete rows and out-of-order rows as queries
+        # STEP 1: if inserting default values, add the default row
+        tok = next(tokens)
+        if tok == 'DEFAULT':
+            self.__rejected = table.add_row(table.grab_defaults())
+            return
+
+        # STEP 2: if complex, cols holds a list of integers representing the data's final position in a row
+        #         if not, cols holds the range of all columns (0 to end order)
+        if tok == '(':
+            cols = []
+            while True:
+                cols.append(table_cols.index(next(tokens)))
+                if next(tokens) == ',':
+                    continue
+                break
+            next(tokens)  # VALUES
+        else:
+            cols = [i for i in range(len(table_cols))]
+
+        # STEP 3: every row starts as the default row, each column index in cols is set
+        #         to the next value, so any columns not defined keep their default values
+        self.__rejected = []
+        batch = []
+        for tok in tokens:
+            if tok != '(':
+                break
+            row = table.grab_defaults()
+            for j in cols:
+                row[j] = next(tokens)
+                next(tokens)  # , or )
+            batch.append(row)
+            if len(batch) >= _INSERT_BATCH_SIZE:
+                self.__rejected += table.add_rows(batch)
+                batch = []
+
+            # check if we have another row to add
+            if next(tokens, None) != ',':
+                break
+        if batch:
+            self.__rejected += table.add_rows(batch)
+
     def executemany(self, statement, wildcards):
         '''
-        Execute an SQL statement with parameterized queries
+        Execute an SQL statement with parameterized queries. The statement is
+        parsed once and each row's values are bound into it, an INSERT adds
+        every row in one batched insert.
         statement:   Sql statement with wildcard placeholders
-        wildcards:   list of tuples to be inserted as wildcards
+        wildcards:   iterable of tuples to be inserted as wildcards (a generator is fine)
         '''
-        initstatement = statement
+        plan = self.db().statement_cache().get(statement)
+        if plan.tokens()[0] == 'INSERT' and not plan.has('DEFAULT'):
+            self.run(statement, many=wildcards)
+            return
         for row in wildcards:
-            statement = initstatement
-            for i in range(len(row)):
-                value = row[i]
-                if isinstance(value, str):
-                    value = "'" + value + "'"
-                else:
-                    value = str(value)
-                indx = statement.index('?')
+            self.execute(statement, row)
+
+    def load_rows(self, name, rows, cols=None, progress=None):
+        """
+        Bulk loads rows into a table without going through SQL. Rows are taken from
+        any iterable a batch at a time, each batch is type checked one column at a
+        time and appended straight to the table's storage. The table's indexes are
+        brought up to date once, after the last batch.
+        Values are coerced to the column types like INSERT does, rows that can't
+        be are skipped (see rejected). Outside a transaction a file database is
+        checkpointed once the load is done instead of logging the rows.
+
+        name     : table to load into
+        rows     : iterable of sequences of values
+        cols     : names of the columns the values are for (every column if None),
+                   the others get their default values
+        progress : if given, called after each batch with (rows loaded, rows per second)
+        Returns the number of rows loaded
+        """
+        width = len(cols) if cols != None else len(self.load_target(name).grab_cols())
+        return self.load_batches(name, column_batches(rows, width), cols, progress)
+
+    def load_csv(self, name, path, delimiter=None, header=True, progress=None):
+        """
+        Bulk loads a CSV file into a table, see load_rows. Fields are converted to
+        the column types a column of a batch at a time. An empty field is NULL in an
+        INTEGER or REAL column, a row with a field that doesn't convert is skipped.
 
-                statement = statement[:indx] + value + statement[indx+1:]
+        delimiter : ',' by default, a tab for files ending in .tsv
+        header    : the first line names the columns the fields are for
+        """
+        if delimiter == None:
+            delimiter = '\t' if path.endswith('.tsv') else ','
+        table = self.load_target(name)
+        with open(path, newline='', encoding='utf-8') as fp:
+            reader = (row for row in csv.reader(fp, delimiter=delimiter) if row)  # blank lines skipped
+            cols = [c.strip() for c in next(reader, [])] if header else None
+            names = table.grab_col_names()
+            types = [table.grab_cols()[names.index(c)][1] if c in names else None
+                     for c in (cols if cols != None else names)]
+            batches = (convert_columns(columns, types) for columns in column_batches(reader, len(types)))
+            return self.load_batches(name, batches, cols, progress)
+
+    def memory_report(self):
+        """
+        Estimated memory used by each loaded table, {table name: Table.memory()}
+        """
+        return self.db().memory_report()
 
-            self.execute(statement)
+    def rejected(self):
+        """
+        The rows the last INSERT, executemany or bulk load left out, or the last UPDATE
+        left unchanged, because a value couldn't be stored in its column, as (row, reason) pairs
+        """
+        return self.__rejected
+
+    def load_target(self, name) -> 'Table':
+        # the table a bulk load goes into, in the transaction's copy while one is open
+        if self.filename() in _ALL_DATABASES:
+            self.load()
+        db = self.copy() if self.get_tmode() != 0 else self.db()
+        table = db.grab_table(name)
+        if not isinstance(table, Table):
+            raise Exception(f"no such table: {name}")
+        return table
+
+    def load_batches(self, name, batches, cols, progress):
+        """
+        Bulk load helper, runs like a single INSERT statement (locks, transactions,
+        the log) but takes batches of columns, one list per column in cols
+        """
+        if self.get_tmode() != 0:
+            self.set_lock(2)
+        self.detach_cursors()
+
+        table = self.load_target(name)
+        names = table.grab_col_names()
+        for c in cols or ():
+            if c not in names:
+                raise Exception(f"table {name} has no column named {c}")
+        positions = [names.index(c) for c in cols] if cols != None else list(range(len(names)))
+        defaults = table.grab_defaults()
+
+        # inside a transaction the loaded rows are logged when it commits, outside one
+        # a checkpoint saves them, so a large load isn't held twice or logged in one record
+        checkpoint = self.wal() and self.get_tmode() == 0
+        kept = [] if self.wal() and not checkpoint else None
+        self.__rejected = []
+        start = table.slots()
+        began = time.perf_counter()
+        try:
+            for batch in batches:
+                n = len(batch[0])
+                columns = [[defaults[c]] * n for c in range(len(names))]
+                for j in range(len(positions)):
+                    columns[positions[j]] = batch[j]
+                appended, rejected = table.load_batch(columns)
+                self.__rejected += rejected
+                if kept != None:
+                    kept.extend(zip(*appended))
+                if progress:
+                    loaded = table.slots() - start
+                    progress(loaded, loaded / max(time.perf_counter() - began, 1e-9))
+        finally:
+            table.index_from(start)  # deferred, one pass per index instead of one add per row
+            self.save()
+        loaded = table.slots() - start
+        if loaded and checkpoint:
+            self.checkpoint()
+        elif loaded:
+            self.record(f"INSERT INTO {name} VALUES ({', '.join('?' * len(names))});", kept)
+        return loaded
 
     def close(self):
         """
-        Closes the database and writes it to an XML-style .db file
+        Closes the database and writes it to a binary .db file (see FILE FORMAT)
         """
-        filename = self.filename()
+        self.checkpoint()
+
+    def open(self, filename):
+        """
+        Opens a database file. Binary files are memory-mapped and loaded straight
+        into table storage (or table by table on first use if the connection is lazy),
+        older XML files are handed to open_xml. Committed work still in the
+        write-ahead log is replayed after
+        """
+        if filename in _ALL_DATABASES:
+            return  # another connection already loaded it, self.db() is that database
+        try:
+            fp = open(filename, 'rb')
+        except OSError:
+            self.recover(None)
+            return
+        with fp:
+            if fp.read(len(_FILE_MAGIC)) == _FILE_MAGIC:
+                # the map stays usable after fp is closed, lazy tables keep reading from it
+                buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                salt = read_header(buf)[5]
+                read_database(buf, self.db(), self.__lazy)
+                if not self.__lazy:
+                    buf.close()
+                self.save()
+                self.recover(salt)
+                return
+        if not self.open_xml(filename):
+            self.recover(None)
+
+    def open_xml(self, filename):
+        """
+        Opens a legacy XML database file and runs the queries needed to replicate it
 
-        '''
         Structure of the XML file
         <filename>
             <table1>
                 <columnquery>(name TEXT, ...)</columnquery>
                 <rowquery>('Ant', ...)</rowquery>
+                <indexquery>CREATE INDEX ...;</indexquery>   (one per index)
             </table1>
             <table2>
                 ...
             ...
         </filename>
-        '''
-        database = et.Element(filename.strip())
-        
-        db = self.db()
-        for table_name in db.tables():
-            table = et.SubElement(database, table_name)
-            
-            # construct query to create table with columns
-            coldata = db.grab_table(table_name).grab_cols()
-            colquery = "("
-            for i in range(len(coldata)): # 0: colname  1: types  2: defaults
-                colquery += coldata[i][0] + " " + coldata[i][1] + ", "
-            colquery = colquery[:-2] + ")"  # remove ,
-            columns = et.SubElement(table, 'columnquery')
-            columns.text = colquery
-
-            # construct query to insert data
-            rowdata = db.grab_table(table_name).grab_rows()
-            rowquery = "("
-            for i in range(len(rowdata)):
-                for j in range(len(coldata)):
-                    if not rowdata[i][j]:
-                        rowquery += "NULL, "
-                    elif coldata[j][1] == 'TEXT':
-                        rowquery += "'" + rowdata[i][j] + "', "
-                    else:
-                        rowquery += str(rowdata[i][j]) + ", "
-                rowquery = rowquery[:-2] + "), ("
-            rowquery = rowquery[:-3]
-            rows = et.SubElement(table, 'rowquery')
-            rows.text = rowquery
-        
-        # write the database to file w/ given filename
-        fp = open(filename, 'wb')
-        fp.write(et.tostring(database))
-        fp.close()
 
-    def open(self, filename):
-        """
-        Opens a database file and runs the queries needed to replicate it
+        Nothing is logged while the file loads, once every table is in a checkpoint
+        rewrites it as a binary file. Returns False if the file isn't XML
         """
         try:
             database = et.parse(filename)
         except:
-            return
+            return False
         
         database = database.getroot()
-        for table in database:
-            colquery = table[0].text
-            rowquery = table[1].text
+        self.__replaying = True  # the statements rebuild what the file already holds
+        try:
+            for table in database:
+                colquery = table[0].text
+                rowquery = table[1].text
+
+                tablequery = f"CREATE TABLE {table.tag} {colquery};"
+                self.execute(tablequery)
+                if rowquery:
+                    # stream the rows in, the saved row text can be very large
+                    self.insert_rows(self.db(), chain(['INSERT', 'INTO', table.tag, 'VALUES'], scan(rowquery)))
+                for indexquery in table[2:]:
+                    self.execute(indexquery.text)
+        finally:
+            self.__replaying = False
+        if self.wal():
+            self.checkpoint()
+        return True
+
+
 
-            tablequery = f"CREATE TABLE {table.tag} {colquery};"
-            self.execute(tablequery)
-            if rowquery:
-                dataquery = f"INSERT INTO {table.tag} VALUES {rowquery};"
-                self.execute(dataquery)
 
 
+class Cursor(object):
+    """
+    The rows of a statement, pulled from its pipeline as they are fetched,
+    so a large result never has to be held in memory all at once.
+    Returned by Connection.cursor() and Connection.execute
+    """
+    def __init__(self, connection: 'Connection'):
+        self.__connection = connection
+        self.__rows = iter(())
+        self.arraysize = 1  # rows returned by fetchmany() when no size is given
+
+    def connection(self) -> 'Connection':
+        return self.__connection
+
+    def execute(self, statement, params=()):
+        rows = self.__connection.run(statement, params=params)
+        if isinstance(rows, list):
+            self.__rows = iter(rows)
+        else:
+            # still reading the database, detach() is called before anything changes it
+            self.__rows = rows
+            _CURSORS.setdefault(self.__connection.filename(), weakref.WeakSet()).add(self)
+        return self
+
+    def fetchone(self):
+        # the next row, None once there are no more
+        return next(self.__rows, None)
 
+    def fetchmany(self, size=None):
+        # up to size rows (arraysize if not given), an empty list once there are no more
+        return list(islice(self.__rows, self.arraysize if size == None else size))
+
+    def fetchall(self):
+        return list(self.__rows)
+
+    def detach(self):
+        # reads the rest of the rows now, before the tables under the pipeline change
+        self.__rows = iter(list(self.__rows))
+        cursors = _CURSORS.get(self.__connection.filename())
+        if cursors != None:
+            cursors.discard(self)
+
+    def close(self):
+        self.__rows = iter(())
+        cursors = _CURSORS.get(self.__connection.filename())
+        if cursors != None:
+            cursors.discard(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.__rows)
 
 
 ##################################################
@@ -650,20 +1098,49 @@ class Database(object):
     # will have views in the future
     # tables will have unique names
     
-    def __init__(self):
+    def __init__(self, cache=None):
         self.__tables = {}  # key = table name, value = table class
         self.__views = {}   # key = view name, value = view class
+        self.__lazy = {}    # key = table name, value = LazyTable still in its file
+        # parsed statements only depend on the sql text, so copies share the cache
+        self.__cache = cache if cache else StatementCache()
 
     def tables(self):
-        return self.__tables
+        # names of all tables, loaded or not
+        return list(self.__tables) + list(self.__lazy)
+
+    def memory_report(self):
+        # Table.memory() of every loaded table, lazy tables are still in their file
+        return {name: self.__tables[name].memory() for name in self.__tables}
+
+    def vacuum(self):
+        # compacts every loaded table, lazy tables were compacted when their file was written
+        for table in self.__tables.values():
+            table.compact()
+
+    def add_lazy_table(self, lazy: 'LazyTable'):
+        # the table is loaded from its file the first time grab_table asks for it
+        if lazy.name() in self.__tables or lazy.name() in self.__lazy:
+            raise Exception(f"tried to create table {lazy.name()} but it already exists")
+        self.__lazy[lazy.name()] = lazy
+
+    def grab_lazy(self, name: str) -> 'LazyTable':
+        # returns the LazyTable if name has not been loaded yet, None otherwise
+        return self.__lazy.get(name)
+
+    def statement_cache(self) -> 'StatementCache':
+        return self.__cache
 
     def create_table(self, name: str, table: 'Table'):
-        if name in self.__tables:
+        if name in self.__tables or name in self.__lazy:
             raise Exception(f"tried to create table {name} but it already exists")
             return
         self.__tables[name] = table
 
     def remove_table(self, name: str):
+        if name in self.__lazy:
+            self.__lazy.pop(name)
+            return
         if name not in self.__tables:
             raise Exception(f"tried to delete table {name} but it does not exist")
             return
@@ -672,25 +1149,48 @@ class Database(object):
     def grab_table(self, name: str) -> 'Table':
         if name in self.__tables:
             return self.__tables[name]
+        if name in self.__lazy:
+            self.__tables[name] = self.__lazy.pop(name).table()
+            return self.__tables[name]
         if name in self.__views:
             return self.__views[name]
         return None
+
+    def create_index(self, name: str, table_name: str, col: str):
+        # index names are unique across the whole database
+        if self.grab_index(name):
+            raise Exception(f"tried to create index {name} but it already exists")
+        if self.grab_table(table_name) not in self.__tables.values():
+            raise Exception(f"tried to create index {name} on table {table_name} but it does not exist")
+        self.__tables[table_name].create_index(name, col)
+
+    def remove_index(self, name: str):
+        if not self.grab_index(name):
+            raise Exception(f"tried to delete index {name} but it does not exist")
+        for table in self.__tables.values():
+            if name in table.indexes():
+                table.remove_index(name)
+                return
+
+    def grab_index(self, name: str) -> 'Index':
+        for lazy in list(self.__lazy.values()):
+            if name in lazy.index_names():
+                self.grab_table(lazy.name())  # only the table owning the index gets loaded
+        for table in self.__tables.values():
+            if name in table.indexes():
+                return table.indexes()[name]
+        return None
     
     def copy(self):
-        # returns a database object w the same data
-        dbcopy = Database()
+        # returns a database object w the same data.
+        # tables are cloned copy-on-write, so this costs O(tables) and each
+        # later write only copies the pages it touches
+        dbcopy = Database(self.__cache)
         for table in self.__tables:
-            ccols = []
-            ctypes = []
-            cdefs = []
-            for col in self.__tables[table].grab_col_all():
-                ccols.append(col[0])
-                ctypes.append(col[1])
-                cdefs.append(col[2])
-            tablecopy = Table(ccols, ctypes, cdefs)
-            dbcopy.create_table(table, tablecopy)
-            for row in self.__tables[table].grab_rows():
-                dbcopy.grab_table(table).add_row(list(row))
+            dbcopy.create_table(table, self.__tables[table].clone())
+        for view in self.__views:
+            dbcopy.__views[view] = self.__views[view]  # views never change
+        dbcopy.__lazy = dict(self.__lazy)  # each copy loads its own clone when needed
         return dbcopy
     
     def views(self):
@@ -717,10 +1217,107 @@ class View(object):
 
 
 
+# python types a column of each type accepts as is, anything else only takes NULL
+_COLUMN_TYPES = {'INTEGER': (int, type(None)), 'REAL': (float, type(None)), 'TEXT': (str, type(None))}
+_REJECT = object()  # returned by a coerce_* function for a value it can't convert
+
+
+def coerce_integer(value):
+    # INTEGER affinity: whole floats and text holding a whole number become ints
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                value = float(value)
+            except ValueError:
+                return _REJECT
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return _REJECT
+
+
+def coerce_real(value):
+    # REAL affinity: ints and text holding a number become floats
+    if isinstance(value, (int, str)):
+        try:
+            return float(value)
+        except (ValueError, OverflowError):
+            return _REJECT
+    return _REJECT
+
+
+def coerce_text(value):
+    # TEXT affinity: numbers are stored as their text
+    if isinstance(value, (int, float)):
+        return str(value)
+    return _REJECT
+
+_COERCE = {'INTEGER': coerce_integer, 'REAL': coerce_real, 'TEXT': coerce_text}
+
+
+class RowValidator(object):
+    """
+    Checks batches of rows against a table's column types, built once from the
+    schema. A value of another type is coerced like sqlite's type affinity does
+    (an int in a REAL column becomes a float, a number in a TEXT column its text),
+    a row with a value that can't be coerced is rejected.
+    """
+    def __init__(self, cols: list, types: list):
+        self.__cols = list(cols)
+        self.__types = list(types)
+        self.__allowed = [_COLUMN_TYPES.get(t, (type(None),)) for t in types]
+        self.__coerce = [_COERCE.get(t) for t in types]
+
+    def check(self, columns: list):
+        """
+        columns : a batch of rows given column by column
+        Returns (columns, rejected), the columns of the rows that passed (coerced
+        where needed) and a (row, reason) pair for every rejected row
+        """
+        bad = {}  # key = position in the batch, value = why it was rejected
+        checked = []
+        for c in range(len(columns)):
+            values = columns[c]
+            allowed = self.__allowed[c]
+            if all(map(isinstance, values, repeat(allowed))):
+                checked.append(values)  # the usual case, one pass in C
+                continue
+            values = list(values)
+            for i in range(len(values)):
+                if isinstance(values[i], allowed):
+                    continue
+                value, reason = self.coerce(c, values[i])
+                if reason:
+                    bad.setdefault(i, reason)
+                else:
+                    values[i] = value
+            checked.append(values)
+        if not bad:
+            return checked, []
+        rejected = [(tuple(values[i] for values in columns), bad[i]) for i in sorted(bad)]
+        keep = [i not in bad for i in range(len(columns[0]))]
+        return [list(compress(values, keep)) for values in checked], rejected
+
+    def coerce(self, c: int, value):
+        """
+        A single value for the column at position c, coerced like check does.
+        Returns (value, None), or (None, reason) if it can't be stored
+        """
+        if isinstance(value, self.__allowed[c]):
+            return value, None
+        coerce = self.__coerce[c]
+        coerced = coerce(value) if coerce else _REJECT
+        if coerced is _REJECT:
+            return None, f"{value!r} can't be stored in {self.__types[c]} column {self.__cols[c]}"
+        return coerced, None
+
+
 class Table(object):
     # columns, with specified type and default values
     # rows
-    def __init__(self, cols: list, types: list, defaults: list):
+    # rows are kept by a store, either row-major (RowStore) or column-major (ColumnStore)
+    def __init__(self, cols: list, types: list, defaults: list, columnar: bool = False):
         assert len(cols) == len(types) == len(defaults)
 
         self.__columns = []
@@ -728,17 +1325,93 @@ class Table(object):
             column = tuple([cols[i], types[i], defaults[i]])
             self.__columns.append(column)
 
-        self.__rows = []  # row objects
+        self.__columnar = columnar
+        self.__store = ColumnStore(types) if columnar else RowStore()
+        self.__indexes = {}  # key = index name, value = Index
+        self.__validator = RowValidator(cols, types)
+        self.__dead = set()  # positions of deleted rows still in the store (tombstones)
+        self.__dead_owned = True  # False while dead may be shared with a clone
     
     def grab_cols(self):
         return self.__columns
+
+    def columnar(self):
+        return self.__columnar
     
+    # rows are handed out as the stored tuples themselves, never copies.
+    # tuples can't be changed in place and update() swaps in a new tuple,
+    # so a caller holding a row keeps the version it read.
+    # a row's position is its slot in the store, deleted rows keep their slot
+    # (see delete) until compact(), every read below skips them
+
     def grab_rows(self):
-        data = []
-        rows = self.__rows
-        for row in rows:
-            data.append(row.grab_data())
-        return data
+        # a new list the caller may sort or filter, the rows in it are shared
+        if not self.__dead:
+            return self.__store.rows()
+        return [row for i, row in self.iter_items()]
+
+    def iter_rows(self):
+        # streams rows in order without building a list
+        if not self.__dead:
+            return self.__store.iter_rows()
+        return (row for i, row in self.iter_items())
+
+    def iter_items(self):
+        # streams (position, row) pairs in order
+        if not self.__dead:
+            return enumerate(self.__store.iter_rows())
+        dead = self.__dead
+        return ((i, row) for i, row in enumerate(self.__store.iter_rows()) if i not in dead)
+
+    def grab_row(self, pos: int):
+        return self.__store.get(pos)
+
+    def grab_column(self, col: int):
+        # every value of the column at position col, in row order
+        values = self.__store.column(col)
+        if not self.__dead:
+            return values
+        dead = self.__dead
+        return [values[i] for i in range(len(values)) if i not in dead]
+
+    def iter_batches(self, live: bool = True):
+        """
+        Streams the table in batches of rows, each batch as a list of columns.
+        live=False keeps the deleted rows in, so positions line up with the slots
+        """
+        if live and self.__dead:
+            return self.__live_batches()
+        return self.__store.iter_batches()
+
+    def __live_batches(self):
+        dead = self.__dead
+        start = 0
+        for columns in self.__store.iter_batches():
+            end = start + len(columns[0])
+            keep = [i - start for i in range(start, end) if i not in dead]
+            if len(keep) == end - start:
+                yield columns
+            elif keep:
+                yield [[col[i] for i in keep] for col in columns]
+            start = end
+
+    def positions(self):
+        # positions of every row, in order
+        if not self.__dead:
+            return range(self.__store.count())
+        dead = self.__dead
+        return [i for i in range(self.__store.count()) if i not in dead]
+
+    def tombstones(self):
+        # positions of deleted rows not compacted away yet, don't change the set
+        return self.__dead
+
+    def count(self):
+        return self.__store.count() - len(self.__dead)
+
+    def slots(self):
+        # rows in the store, deleted ones included, the position the next row gets
+        return self.__store.count()
     
     def grab_col_all(self):
         cols = []
@@ -751,6 +1424,9 @@ class Table(object):
         for c in self.__columns:
             cols.append(c[0])
         return cols
+
+    def grab_col_types(self):
+        return [c[1] for c in self.__columns]
     
     def grab_defaults(self):
         defaults = []
@@ -768,215 +1444,2191 @@ class Table(object):
             cols.append(name + '.' + c[0])
         return cols
     
+    def indexes(self):
+        return self.__indexes
+
+    def clone(self) -> 'Table':
+        # a snapshot of the table, rows and indexes are shared until written to
+        ccols = []
+        ctypes = []
+        cdefs = []
+        for col in self.__columns:
+            ccols.append(col[0])
+            ctypes.append(col[1])
+            cdefs.append(col[2])
+        table = Table(ccols, ctypes, cdefs, self.__columnar)
+        table.__validator = self.__validator
+        table.__store = self.__store.clone()
+        table.__dead = self.__dead
+        table.__dead_owned = self.__dead_owned = False
+        for name in self.__indexes:
+            table.__indexes[name] = self.__indexes[name].clone()
+        return table
+
+    def grab_index(self, col: int) -> 'Index':
+        # returns an index on the column at position col, None if there isn't one
+        for index in self.__indexes.values():
+            if index.column() == col:
+                return index
+        return None
+
+    def create_index(self, name: str, col: str):
+        index = Index(name, self.grab_col_names().index(col))
+        index.rebuild(self.__store, self.__dead)
+        self.__indexes[name] = index
+
+    def remove_index(self, name: str):
+        self.__indexes.pop(name)
+
     def add_row(self, data: list):
-        cols = self.grab_cols()
-        assert len(cols) == len(data)
-        for i in range(len(cols)):
-            if self.verify_type(data[i], cols[i][1]):
+        return self.add_rows([data])
+
+    def add_rows(self, rows: list):
+        """
+        Appends a batch of rows, checked and coerced a column at a time by the
+        table's RowValidator. Returns the rejected rows as (row, reason) pairs
+        """
+        if not rows:
+            return []
+        assert set(map(len, rows)) == {len(self.__columns)}
+        start = self.__store.count()
+        columns, rejected = self.__validator.check(list(zip(*rows)))
+        if columns[0]:
+            self.__store.extend_columns(columns)
+            for index in self.__indexes.values():
+                for pos, value in enumerate(columns[index.column()], start):
+                    index.add(value, pos)
+        return rejected
+
+    def load_columns(self, columns: list):
+        """
+        Appends rows given column by column, without type checks.
+        Only for trusted data (a saved database), indexes are rebuilt after.
+        columns : one list of values per column, all the same length
+        """
+        self.__store.extend_columns(columns)
+        for index in self.__indexes.values():
+            index.rebuild(self.__store, self.__dead)
+
+    def load_batch(self, columns: list):
+        """
+        Bulk load helper. Appends a batch of rows given column by column, checked and
+        coerced like add_rows. Indexes are left for index_from.
+        columns : one list of values per column, all the same length
+        Returns (columns as appended, rejected rows), see RowValidator.check
+        """
+        columns, rejected = self.__validator.check(columns)
+        if columns and columns[0]:
+            self.__store.extend_columns(columns)
+        return columns, rejected
+
+    def index_from(self, start: int):
+        # adds the rows from position start on to every index, once a bulk load is done
+        for index in self.__indexes.values():
+            if start == 0:
+                index.rebuild(self.__store, self.__dead)
                 continue
+            values = self.__store.column(index.column())
+            for pos in range(start, len(values)):
+                index.add(values[pos], pos)
+
+    def clear(self):
+        self.__store.clear()
+        self.__dead = set()
+        self.__dead_owned = True
+        for index in self.__indexes.values():
+            index.rebuild(self.__store)
+
+    def memory(self):
+        """
+        Estimated bytes the table holds in memory (see deep_size), as a dict:
+        rows, dead (deleted rows not compacted yet), store (the rows' storage),
+        indexes, total, and total per row
+        """
+        seen = set()  # a value kept by the store and an index is only counted once
+        store = self.__store.memory(seen) + deep_size([self.__dead], seen)
+        indexes = sum(index.memory(seen) for index in self.__indexes.values())
+        rows = self.count()
+        return {'rows': rows, 'dead': len(self.__dead), 'store': store, 'indexes': indexes,
+                'total': store + indexes, 'per_row': (store + indexes) / rows if rows else 0}
+
+    def update(self, sets, inds):
+        """
+        Sets columns of the rows at positions inds (from where(), or a range for every row).
+        sets is a list of [column position, value], each value checked and coerced by the
+        table's RowValidator like an inserted one. If one can't be stored no row changes.
+        Returns the rows left unchanged as (row, reason) pairs, like add_rows
+        """
+        checked = []
+        for c, value in sets:
+            value, reason = self.__validator.coerce(c, value)
+            if reason:
+                rejected = []
+                for i in sorted(inds):
+                    data = list(self.__store.get(i))
+                    for s in sets:
+                        data[s[0]] = s[1]
+                    rejected.append((tuple(data), reason))
+                return rejected
+            checked.append([c, value])
+        sets = checked
+        for i in inds:
+            old = self.__store.get(i)
+            data = list(old)
+            for s in sets:
+                data[s[0]] = s[1]
+            self.__store.set(i, data)  # first, so the indexes are untouched if it fails
+            for index in self.__indexes.values():
+                index.remove(old[index.column()], i)
+                index.add(data[index.column()], i)
+        return []
+
+    def delete(self, inds):  # set of inds from where()
+        """
+        Tombstones the rows at positions inds: their index entries go and their
+        slots are skipped by every read, the store itself is left alone. Costs
+        O(len(inds)), the slots are reclaimed by compact() once deleted rows
+        make up _COMPACT_RATIO of the table
+        """
+        if not inds:
+            return
+        indexes = self.__indexes.values()
+        for i in inds:
+            row = self.__store.get(i)
+            for index in indexes:
+                index.remove(row[index.column()], i)
+        if not self.__dead_owned:
+            self.__dead = set(self.__dead)
+            self.__dead_owned = True
+        self.__dead.update(inds)
+        if len(self.__dead) >= self.__store.count() * _COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        # drops the deleted rows from the store, later rows move up so the indexes are rebuilt
+        if not self.__dead:
+            return
+        self.__store.delete(self.__dead)
+        self.__dead = set()
+        self.__dead_owned = True
+        for index in self.__indexes.values():
+            index.rebuild(self.__store)
+
+def deep_size(objects: list, seen: set):
+    """
+    Bytes held by objects and everything inside them (lists, tuples, sets and dicts
+    are followed), as sys.getsizeof counts them. Objects whose id is in seen are
+    skipped and every counted one is added, so values shared by many rows count once.
+    """
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+    return total
+
+class RowStore(object):
+    # row-major storage, each row a plain tuple, kept in fixed size pages.
+    # clone() shares the pages between both stores, a page is copied by whichever
+    # store writes to it first, so a snapshot costs O(pages) and a write O(page)
+    def __init__(self):
+        self.__pages = []  # lists of up to _PAGE_ROWS row tuples
+        self.__owned = []  # owned[p] is False while page p may be shared with a clone
+        self.__count = 0
+
+    def count(self):
+        return self.__count
+
+    def get(self, pos: int):
+        return self.__pages[pos // _PAGE_ROWS][pos % _PAGE_ROWS]
+
+    def rows(self):
+        return list(chain.from_iterable(self.__pages))
+
+    def iter_rows(self):
+        for page in self.__pages:
+            yield from page
+
+    def iter_batches(self):
+        for page in self.__pages:
+            yield [list(col) for col in zip(*page)]
+
+    def column(self, col: int):
+        return list(map(itemgetter(col), chain.from_iterable(self.__pages)))
+
+    def append(self, data):
+        if not self.__count % _PAGE_ROWS:
+            self.__pages.append([])
+            self.__owned.append(True)
+        self.__page(len(self.__pages) - 1).append(tuple(data))
+        self.__count += 1
+
+    def extend_columns(self, columns: list):
+        self.extend_rows(list(zip(*columns)))
+
+    def set(self, pos: int, data):
+        # a new tuple, the old one may still be part of a snapshot
+        self.__page(pos // _PAGE_ROWS)[pos % _PAGE_ROWS] = tuple(data)
+
+    def delete(self, inds):
+        # inds is a set, one pass keeps every row not in it, the tuples themselves are reused
+        rows = [row for i, row in enumerate(chain.from_iterable(self.__pages)) if i not in inds]
+        self.clear()
+        self.extend_rows(rows)
+
+    def extend_rows(self, rows: list):
+        # a page at a time, only the last page can already be partly filled
+        i = 0
+        if self.__count % _PAGE_ROWS:
+            i = _PAGE_ROWS - self.__count % _PAGE_ROWS
+            self.__page(len(self.__pages) - 1).extend(rows[:i])
+        for start in range(i, len(rows), _PAGE_ROWS):
+            self.__pages.append(rows[start:start + _PAGE_ROWS])
+            self.__owned.append(True)
+        self.__count += len(rows)
+
+    def memory(self, seen: set):
+        # bytes held by the pages and the rows in them, see deep_size
+        return deep_size([self.__pages, self.__owned], seen)
+
+    def clear(self):
+        self.__pages = []
+        self.__owned = []
+        self.__count = 0
+
+    def clone(self) -> 'RowStore':
+        store = RowStore()
+        store.__pages = list(self.__pages)
+        store.__owned = [False] * len(self.__pages)
+        store.__count = self.__count
+        self.__owned = [False] * len(self.__pages)
+        return store
+
+    def __page(self, p: int):
+        # returns page p, copying it first if it might be shared
+        if not self.__owned[p]:
+            self.__pages[p] = list(self.__pages[p])
+            self.__owned[p] = True
+        return self.__pages[p]
+
+class ColumnStore(object):
+    # column-major storage, each column split into chunks of up to _BATCH_ROWS values
+    #   INTEGER : array('q') chunks, NULLs are stored as 0 and flagged in a null bitmap per chunk
+    #   REAL    : array('d') chunks, same null bitmaps
+    #   TEXT    : list chunks of interned strings, NULL stays None
+    # an INTEGER column that gets a value too big for 64 bits, or a column that gets a value
+    # its array can't hold (text in a REAL column, 2.5 in an INTEGER one), falls back to list chunks.
+    # clone() shares the chunks between both stores, chunk k of every column is copied by
+    # whichever store writes to it first, so a snapshot costs O(chunks) and a write O(chunk)
+    def __init__(self, types: list):
+        self.__types = types
+        self.__cols = [[] for t in types]  # chunks of each column
+        self.__nulls = []  # per column a bytearray per chunk (bit set = NULL), None for list columns
+        for t in types:
+            self.__nulls.append([] if t in ('INTEGER', 'REAL') else None)
+        self.__owned = []  # owned[k] is False while chunk k may be shared with a clone
+        self.__count = 0
+
+    def count(self):
+        return self.__count
+
+    def get(self, pos: int):
+        k, i = divmod(pos, _BATCH_ROWS)
+        return tuple(self.__value(c, k, i) for c in range(len(self.__cols)))
+
+    def rows(self):
+        return list(self.iter_rows())
+
+    def iter_rows(self):
+        # rebuilds rows a batch at a time, a scan never holds more than one batch of values
+        for columns in self.iter_batches():
+            yield from zip(*columns)
+
+    def iter_batches(self):
+        # one batch per chunk
+        for k in range(len(self.__owned)):
+            yield [self.__slice(c, k) for c in range(len(self.__cols))]
+
+    def column(self, col: int):
+        return list(chain.from_iterable(self.__slice(col, k) for k in range(len(self.__owned))))
+
+    def __slice(self, col: int, k: int):
+        # values of chunk k of a column, NULLs as None
+        values = self.__cols[col][k]
+        nulls = self.__nulls[col]
+        if nulls == None or not any(nulls[k]):
+            return values[:]
+        flags = nulls[k]
+        return [None if flags[i >> 3] & (1 << (i & 7)) else values[i] for i in range(len(values))]
+
+    def append(self, data):
+        k, i = divmod(self.__count, _BATCH_ROWS)
+        if not i:
+            self.__add_chunk()
+        self.__own(k)
+        if not i & 7:
+            # one more byte of null flags every 8 rows
+            for nulls in self.__nulls:
+                if nulls != None:
+                    nulls[k].append(0)
+        for c in range(len(self.__cols)):
+            value = data[c]
+            nulls = self.__nulls[c]
+            if nulls == None:
+                self.__cols[c][k].append(sys.intern(value) if isinstance(value, str) else value)
+            elif value == None:
+                self.__cols[c][k].append(0)
+                nulls[k][i >> 3] |= 1 << (i & 7)
             else:
-                #print("data does not meet type specifications:\n", data)
-                return
-        #print("add success")
-        self.__rows.append(Row(data))
+                try:
+                    self.__cols[c][k].append(value)
+                except (OverflowError, TypeError):
+                    self.__to_list(c)
+                    self.__cols[c][k].append(value)
+        self.__count += 1
+
+    def extend_columns(self, columns: list):
+        # fills the last chunk, then adds new ones
+        total = len(columns[0])
+        done = 0
+        while done < total:
+            k, start = divmod(self.__count, _BATCH_ROWS)
+            if not start:
+                self.__add_chunk()
+            self.__own(k)
+            n = min(_BATCH_ROWS - start, total - done)
+            for c in range(len(self.__cols)):
+                values = columns[c][done:done + n]
+                nulls = self.__nulls[c]
+                if nulls == None:
+                    self.__cols[c][k].extend([sys.intern(v) if isinstance(v, str) else v for v in values])
+                    continue
+                flags = nulls[k]
+                flags.extend(bytes((start + n + 7) // 8 - len(flags)))
+                for i in range(n):
+                    if values[i] == None:
+                        flags[(start + i) >> 3] |= 1 << ((start + i) & 7)
+                try:
+                    self.__cols[c][k].extend(array(self.__cols[c][k].typecode, [0 if v == None else v for v in values]))
+                except (OverflowError, TypeError):
+                    self.__to_list(c)
+                    self.__cols[c][k].extend(values)
+            self.__count += n
+            done += n
+
+    def set(self, pos: int, data):
+        k, i = divmod(pos, _BATCH_ROWS)
+        self.__own(k)
+        for c in range(len(self.__cols)):
+            value = data[c]
+            nulls = self.__nulls[c]
+            if nulls == None:
+                self.__cols[c][k][i] = sys.intern(value) if isinstance(value, str) else value
+            elif value == None:
+                self.__cols[c][k][i] = 0
+                nulls[k][i >> 3] |= 1 << (i & 7)
+            else:
+                try:
+                    self.__cols[c][k][i] = value
+                except (OverflowError, TypeError):
+                    self.__to_list(c)
+                    self.__cols[c][k][i] = value
+                    continue
+                nulls[k][i >> 3] &= ~(1 << (i & 7)) & 0xff
+
+    def delete(self, inds):
+        # inds is a set, the kept values are copied back a column at a time
+        keep = [i for i in range(self.__count) if i not in inds]
+        columns = [self.column(c) for c in range(len(self.__cols))]
+        self.clear()
+        if keep:
+            self.extend_columns([[col[i] for i in keep] for col in columns])
 
-    def verify_type(self, value, type):
-        if value == None:
-            return True
-        elif type == "INTEGER":
-            return isinstance(value, int)
-        elif type == "REAL":
-            return isinstance(value, float)
-        elif type == "TEXT":
-            return isinstance(value, str)
-        else:
-            #print("what the dog doin")
-            return False
-        
     def clear(self):
-        self.__rows.clear()
-
-    def update(self, sets, inds):  # inds from where()
-        for i in range(len(self.__rows)):
-            if i in inds:
-                data = list(self.__rows[i].grab_data())
-                for s in sets:
-                    data[s[0]] = s[1]
-                self.__rows[i].update_data(data)
-
-    def delete(self, inds):  # inds from where()
-        newrows = []
-        for i in range(len(self.__rows)):
-            data = self.__rows[i].grab_data()
-            if i not in inds:
-                newrows.append(Row(data))
-        self.__rows = newrows
-
-class Row(object):
-    def __init__(self, data):
-        self.__data = tuple(data)
-
-    def grab_data(self):
-        return copy.deepcopy(self.__data)
-    
-    def update_data(self, data):
-        self.__data = tuple(data)
+        # list columns stay lists
+        self.__cols = [[] for c in self.__cols]
+        self.__nulls = [[] if nulls != None else None for nulls in self.__nulls]
+        self.__owned = []
+        self.__count = 0
+
+    def memory(self, seen: set):
+        # bytes held by the column chunks, null bitmaps and the values in list columns
+        return deep_size([self.__cols, self.__nulls], seen)
+
+    def clone(self) -> 'ColumnStore':
+        store = ColumnStore(self.__types)
+        store.__cols = [list(chunks) for chunks in self.__cols]
+        store.__nulls = [list(nulls) if nulls != None else None for nulls in self.__nulls]
+        store.__owned = [False] * len(self.__owned)
+        store.__count = self.__count
+        self.__owned = [False] * len(self.__owned)
+        return store
+
+    def __add_chunk(self):
+        for c in range(len(self.__cols)):
+            if self.__nulls[c] == None:
+                self.__cols[c].append([])
+            else:
+                self.__cols[c].append(array('q' if self.__types[c] == 'INTEGER' else 'd'))
+                self.__nulls[c].append(bytearray())
+        self.__owned.append(True)
+
+    def __own(self, k: int):
+        # copies chunk k of every column if it might be shared
+        if not self.__owned[k]:
+            for c in range(len(self.__cols)):
+                self.__cols[c][k] = self.__cols[c][k][:]
+                if self.__nulls[c] != None:
+                    self.__nulls[c][k] = bytearray(self.__nulls[c][k])
+            self.__owned[k] = True
+
+    def __value(self, c, k, i):
+        nulls = self.__nulls[c]
+        if nulls != None and nulls[k][i >> 3] & (1 << (i & 7)):
+            return None
+        return self.__cols[c][k][i]
+
+    def __to_list(self, c):
+        # new lists, so chunks shared with a clone are left as they are
+        self.__cols[c] = [list(self.__slice(c, k)) for k in range(len(self.__owned))]
+        self.__nulls[c] = None
+
+class Index(object):
+    # secondary index on one column of a table, rows are referred to by position
+    #   shards : hash part, value -> set of row positions (for = and !=), split by hash into
+    #            dicts of about _INDEX_CHUNK values each
+    #   chunks : sorted part, the distinct non-NULL values (for < >, MIN, MAX and ORDER BY)
+    #            in value_key order, numbers before text, so a column holding both still sorts,
+    #            split into sorted lists of up to 2 * _INDEX_CHUNK values
+    # clone() shares shards, chunks and buckets between both indexes, whichever writes to one
+    # first copies it, like RowStore pages, so a snapshot costs O(shards + chunks)
+    def __init__(self, name: str, col: int):
+        self.__name = name
+        self.__col = col
+        self.__shards = [{}]
+        self.__shards_owned = [True]
+        self.__chunks = []
+        self.__chunks_owned = []
+        self.__size = 0        # distinct values, NULL included
+        self.__owned = None    # after clone(), the values whose bucket this index has copied (None = all)
+
+    def name(self):
+        return self.__name
+
+    def column(self):
+        return self.__col
+
+    def add(self, value, pos: int):
+        bucket = self.__bucket(value)
+        if bucket:
+            bucket.add(pos)
+            return
+        self.__shard(value)[value] = {pos}
+        if self.__owned != None:
+            self.__owned.add(value)
+        self.__size += 1
+        if value != None:
+            self.__add_key(value)
+        if self.__size > len(self.__shards) * _INDEX_CHUNK:
+            self.__reshard(len(self.__shards) * 2)
+
+    def remove(self, value, pos: int):
+        bucket = self.__bucket(value)
+        bucket.discard(pos)
+        if not bucket:
+            self.__shard(value).pop(value)
+            self.__size -= 1
+            if value != None:
+                self.__remove_key(value)
+
+    def rebuild(self, store, dead: set = ()):
+        # dead : positions of deleted rows still in the store, left out
+        buckets = {}
+        for pos, value in enumerate(store.column(self.__col)):
+            if pos in dead:
+                continue
+            if value in buckets:
+                buckets[value].add(pos)
+            else:
+                buckets[value] = {pos}
+        self.__shards = [buckets]
+        self.__shards_owned = [True]
+        self.__size = len(buckets)
+        shards = 1
+        while self.__size > shards * _INDEX_CHUNK:
+            shards *= 2
+        self.__reshard(shards)
+        keys = sorted((key for key in buckets if key != None), key=value_key)
+        self.__chunks = [keys[i:i + _INDEX_CHUNK] for i in range(0, len(keys), _INDEX_CHUNK)]
+        self.__chunks_owned = [True] * len(self.__chunks)
+        self.__owned = None
+
+    def clone(self) -> 'Index':
+        # copies are made lazily, see __shard, __chunk and __bucket
+        index = Index(self.__name, self.__col)
+        index.__shards = list(self.__shards)
+        index.__chunks = list(self.__chunks)
+        index.__size = self.__size
+        for idx in (index, self):
+            idx.__shards_owned = [False] * len(self.__shards)
+            idx.__chunks_owned = [False] * len(self.__chunks)
+            idx.__owned = set()
+        return index
+
+    def __get(self, value):
+        # the bucket of value, None if there isn't one, not to be changed
+        return self.__shards[hash(value) & (len(self.__shards) - 1)].get(value)
+
+    def __shard(self, value):
+        # returns the shard value hashes to, copying it first if it might be shared
+        s = hash(value) & (len(self.__shards) - 1)
+        if not self.__shards_owned[s]:
+            self.__shards[s] = dict(self.__shards[s])
+            self.__shards_owned[s] = True
+        return self.__shards[s]
+
+    def __bucket(self, value):
+        # returns the bucket for value ready to be changed, None if there isn't one
+        bucket = self.__get(value)
+        if bucket != None and self.__owned != None and value not in self.__owned:
+            bucket = self.__shard(value)[value] = set(bucket)
+            self.__owned.add(value)
+        return bucket
+
+    def __reshard(self, n: int):
+        # n is a power of 2, the buckets move to n new shards
+        shards = [{} for s in range(n)]
+        for shard in self.__shards:
+            for value, bucket in shard.items():
+                shards[hash(value) & (n - 1)][value] = bucket
+        self.__shards = shards
+        self.__shards_owned = [True] * n
+
+    def __chunk(self, c: int):
+        # returns chunk c, copying it first if it might be shared
+        if not self.__chunks_owned[c]:
+            self.__chunks[c] = list(self.__chunks[c])
+            self.__chunks_owned[c] = True
+        return self.__chunks[c]
+
+    def __find(self, vkey, right: bool = False):
+        """
+        Where a value with value_key vkey falls in the sorted keys, like bisect_left
+        (bisect_right if right) over all of them.
+        returns (chunk, position in it)
+        """
+        find = bisect_right if right else bisect_left
+        c = find(self.__chunks, vkey, key=lambda chunk: value_key(chunk[-1]))
+        if c == len(self.__chunks):
+            return c, 0
+        return c, find(self.__chunks[c], vkey, key=value_key)
+
+    def __add_key(self, value):
+        if not self.__chunks:
+            self.__chunks.append([value])
+            self.__chunks_owned.append(True)
+            return
+        c, i = self.__find(value_key(value))
+        if c == len(self.__chunks):
+            # past the last key
+            c -= 1
+            i = len(self.__chunks[c])
+        chunk = self.__chunk(c)
+        chunk.insert(i, value)
+        if len(chunk) > 2 * _INDEX_CHUNK:
+            self.__chunks[c:c + 1] = [chunk[:_INDEX_CHUNK], chunk[_INDEX_CHUNK:]]
+            self.__chunks_owned[c:c + 1] = [True, True]
+
+    def __remove_key(self, value):
+        c, i = self.__find(value_key(value))
+        chunk = self.__chunk(c)
+        chunk.pop(i)
+        if not chunk:
+            del self.__chunks[c]
+            del self.__chunks_owned[c]
+
+    def memory(self, seen: set):
+        # bytes held by the buckets and sorted keys, see deep_size
+        return deep_size([self.__shards, self.__chunks], seen)
+
+    def lookup(self, op, value):
+        """
+        Returns the positions of rows that may satisfy `column op value`, in the order
+        sqlite's search gives them: a range goes by key, rows with the same key in row
+        order. = has a single key and != reads every row, both in row order.
+        """
+        if op == '=':
+            return sorted(self.__get(value) or ())
+        found = []
+        if op == '!=':
+            for shard in self.__shards:
+                for key, bucket in shard.items():
+                    if key != value:
+                        found += bucket
+            return sorted(found)
+        for key in self.__span(op, value):
+            bucket = self.__get(key)
+            found += bucket if len(bucket) == 1 else sorted(bucket)
+        return found
+
+    def __span(self, op, value):
+        # the sorted keys k for which `k op value` holds (for < > <= >=)
+        if value == None or op not in ('<', '>', '<=', '>='):
+            return []
+        chunks = self.__chunks
+        c, i = self.__find(value_key(value), op in ('<=', '>'))
+        if c == len(chunks):
+            below, above = chunks, []
+        else:
+            below, above = chunks[:c] + [chunks[c][:i]], [chunks[c][i:]] + chunks[c + 1:]
+        return list(chain.from_iterable(below if op in ('<', '<=') else above))
+
+    def smallest(self):
+        # lowest non-NULL value in the column, None if there isn't one
+        return self.__chunks[0][0] if self.__chunks else None
+
+    def largest(self):
+        # highest non-NULL value in the column, None if there isn't one
+        return self.__chunks[-1][-1] if self.__chunks else None
+
+    def ordered(self, descending: bool = False, op=None, value=None):
+        """
+        Yields row positions in column order, the order ORDER BY on the column gives:
+        NULLs first (last when descending), rows with equal values in row order.
+        Descending walks the index backwards like sqlite, equal values in reverse row order,
+        except for = where every row has the same value and they stay in row order.
+
+        op, value : if given, only rows that may satisfy `column op value` (= < > <= >=)
+        """
+        if op == None:
+            # chunk by chunk, so a LIMIT only reads the keys it needs
+            chunks = list(self.__chunks)
+            if descending:
+                keys = chain.from_iterable(map(reversed, reversed(chunks)))
+            else:
+                keys = chain.from_iterable(chunks)
+        elif op == '=':
+            keys = [value] if self.__get(value) else []  # = NULL is IS NULL
+        else:
+            keys = self.__span(op, value)
+        backwards = descending and op != '='
+        nulls = sorted(self.__get(None) or (), reverse=backwards) if op == None else []
+        if descending and op != None:
+            keys = reversed(keys)
+        if not descending:
+            yield from nulls
+        for key in keys:
+            bucket = self.__get(key)
+            yield from bucket if len(bucket) == 1 else sorted(bucket, reverse=backwards)
+        if descending:
+            yield from nulls
 
 ##################################################
 ##################################################
 ##########                              ##########
-##########           TOKENIZE           ##########
+##########            JOINS             ##########
 ##########                              ##########
 ##################################################
 ##################################################
 
-def collect_characters(query, allowed_characters):
-    letters = []
-    for letter in query:
-        if letter not in allowed_characters:
-            break
-        letters.append(letter)
-    return "".join(letters)
+# LEFT OUTER JOIN helpers
+#   left, right : lists of row tuples
+#   lc, rc      : index of the ON column in a left / right row
+#   width       : number of columns in a right row (padding for unmatched left rows)
+# every left row is kept in order, joined with each right row that matches it in
+# right-table order. a NULL ON value matches nothing, like in sqlite.
+# the joins are generators, joined rows are produced as the next operator asks for them
+
+def nested_loop_join(left, right, lc, rc, width):
+    nulls = (None,) * width
+    for ri in left:
+        matched = False
+        if ri[lc] != None:
+            for rj in right:
+                if ri[lc] == rj[rc]:
+                    matched = True
+                    yield ri + rj
+        if not matched:
+            yield ri + nulls
+
+
+def hash_join(left, right, lc, rc, width):
+    nulls = (None,) * width
+    if len(right) <= len(left):
+        # build on the right side, each key holds its rows in table order
+        buckets = {}
+        for rj in right:
+            if rj[rc] != None:
+                buckets.setdefault(rj[rc], []).append(rj)
+        for ri in left:
+            matches = buckets.get(ri[lc]) if ri[lc] != None else None
+            if matches:
+                for rj in matches:
+                    yield ri + rj
+            else:
+                yield ri + nulls
+        return
+
+    # build on the left side, then stream the right side in order,
+    # each right row is handed to every left row waiting on its key
+    waiting = {}  # key = ON value, value = indexes of left rows with that value
+    for i in range(len(left)):
+        if left[i][lc] != None:
+            waiting.setdefault(left[i][lc], []).append(i)
+    matches = [None] * len(left)
+    for rj in right:
+        for i in waiting.get(rj[rc], ()):
+            if matches[i] == None:
+                matches[i] = []
+            matches[i].append(rj)
+    for i in range(len(left)):
+        if matches[i] == None:
+            yield left[i] + nulls
+        else:
+            for rj in matches[i]:
+                yield left[i] + rj
 
 
-def remove_leading_whitespace(query, tokens):
-    whitespace = collect_characters(query, string.whitespace)
-    return query[len(whitespace):]
+def join_cost(left, right):
+    """
+    Estimated row comparisons for each strategy.
+    returns (nested loop cost, hash join cost)
+    """
+    small = min(len(left), len(right))
+    big = max(len(left), len(right))
+    return len(left) * len(right), _HASH_BUILD_COST * small + big
 
 
-def remove_word(query, tokens):
-    word = collect_characters(query,
-                              string.ascii_letters + "_" + "." + "*" + string.digits)
-    if word == "NULL":
-        tokens.append(None)
-    else:
-        tokens.append(word)
-    return query[len(word):]
-
-
-def remove_text(query, tokens):
-    assert query[0] == "'"
-    query = query[1:]
-    i = 0
-    text = ''
-    while True:  # ex query: Li''s dog''s stuffed animal',
-        if query[i] == "'":
-            if query[i+1] == "'":
-                text += "'"
-                i += 2
-                continue
-            # end of text
-            i += 1
-            break
-        text += query[i]
-        i += 1
-    tokens.append(text)
-    return query[i:]
+def join_rows(left, right, lc, rc, width):
+    # picks whichever strategy is estimated to be cheaper
+    nested, hashed = join_cost(left, right)
+    if hashed < nested:
+        return hash_join(left, right, lc, rc, width)
+    return nested_loop_join(left, right, lc, rc, width)
 
+##################################################
+##################################################
+##########                              ##########
+##########       QUERY OPERATORS        ##########
+##########                              ##########
+##################################################
+##################################################
 
-def remove_number(query, tokens):
-    assert query[0] in string.digits or query[0] == '-'
-    text = ""
-    while True:
-        if query[0] in string.digits or query[0] in '-.':
-            text += query[0]
-        else:
-            break
-        query = query[1:]
-    if '.' in text:
-        tokens.append(float(text))
-    else:
-        tokens.append(int(text))
-    return query
+# SELECT runs as a pipeline of generators, each one pulling rows from the one below it
+#   scan -> filter -> join -> aggregate -> sort -> project -> distinct -> limit
+# column stored tables are scanned and filtered a batch of columns at a time
+# rows pass through one at a time, only sort and aggregate need to see every row first
 
+def scan_rows(table: 'Table'):
+    # every row of the table, in order
+    return table.iter_rows()
 
-def tokenize(query):
-    tokens = []
-    while query:
-        #print("Query:{}".format(query))
-        #print("Tokens: ", tokens)
-        old_query = query
-
-        if query[0] in string.whitespace:
-            query = remove_leading_whitespace(query, tokens)
+
+def index_scan(table: 'Table', positions):
+    # the rows at the given positions (as returned by Index.lookup)
+    for i in positions:
+        yield table.grab_row(i)
+
+
+def filter_rows(rows, test):
+    # the rows test returns True for
+    for row in rows:
+        if test(row):
+            yield row
+
+
+def filter_batches(batches, test):
+    # the rows of each batch (a list of columns) that test marks True
+    for columns in batches:
+        yield from compress(zip(*columns), test(columns))
+
+
+def sort_rows(rows, keys: list, descending: list, top: int = None):
+    """
+    Sorts on the columns at positions keys in one pass, the first one is the 'primary' order.
+    Sorting has to see every row, this is where the pipeline holds them all (once the
+    first row is asked for), unless they pass _SORT_MEMORY. Then sorted runs are
+    spilled to temporary files and merged.
+    descending : True for each key column sorted DESC
+    top        : if given only the first top rows are wanted, they are kept in a heap of
+                 that size instead, O(n log top) time and O(top) memory
+    """
+    key, reverse = sort_key(keys, descending)
+    if top != None:
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        yield from pick(top, rows, key=key)  # both are stable, like sort
+        return
+
+    runs = []  # spill files, each holding a sorted run
+    data = []
+    used = 0
+    rowsize = 0
+    for row in rows:
+        if not len(data) % 64:
+            rowsize = row_size(row)  # sampled, measuring every row would cost more than the sort
+        data.append(row)
+        used += rowsize
+        if used >= _SORT_MEMORY:
+            data.sort(key=key, reverse=reverse)
+            runs.append(spill(data))
+            data = []
+            used = 0
+    data.sort(key=key, reverse=reverse)
+    if not runs:
+        yield from data
+        return
+    # merge is stable across runs, so rows that tie keep their input order
+    yield from heapq.merge(*[read_spill(fp) for fp in runs], iter(data), key=key, reverse=reverse)
+
+
+class Descending(object):
+    # wraps a text value so it orders in reverse, for DESC columns mixed with ASC ones
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def value_key(value):
+    # sqlite's order: NULL first, then numbers, then text
+    if value == None:
+        return (0, 0)
+    if isinstance(value, str):
+        return (2, value)
+    return (1, value)
+
+
+def desc_value_key(value):
+    # the reverse of value_key, numbers are negated so only text needs wrapping
+    if value == None:
+        return (2, 0)
+    if isinstance(value, str):
+        return (0, Descending(value))
+    return (1, -value)
+
+
+def sort_key(keys: list, descending: list):
+    """
+    Builds the key for a sort on the columns at positions keys.
+    returns (key function, reverse)
+    """
+    if len(set(descending)) == 1:
+        # one direction for every column, the sort itself can reverse
+        if len(keys) == 1:
+            c = keys[0]
+            return (lambda row: value_key(row[c])), descending[0]
+        return (lambda row: tuple([value_key(row[c]) for c in keys])), descending[0]
+    pairs = [(c, desc_value_key if desc else value_key) for c, desc in zip(keys, descending)]
+    def key(row):
+        return tuple([fn(row[c]) for c, fn in pairs])
+    return key, False
+
+
+def row_size(row):
+    # rough bytes held by a row tuple and its values
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def spill(rows: list):
+    # writes rows to a temporary file (removed once closed), returns the file
+    fp = tempfile.TemporaryFile()
+    for start in range(0, len(rows), _SPILL_ROWS):
+        pickle.dump(rows[start:start + _SPILL_ROWS], fp, pickle.HIGHEST_PROTOCOL)
+    return fp
+
+
+def read_spill(fp):
+    # streams back the rows written by spill, then closes the file
+    fp.seek(0)
+    with fp:
+        while True:
+            try:
+                chunk = pickle.load(fp)
+            except EOFError:
+                return
+            yield from chunk
+
+
+def limit_rows(rows, limit: int, offset: int):
+    # skips offset rows then passes on up to limit rows (all of them if limit is None)
+    return islice(rows, offset, None if limit == None else offset + limit)
+
+
+def project_rows(rows, cols: list):
+    # keeps only the columns at positions cols, in that order
+    for row in rows:
+        yield tuple(row[c] for c in cols)
+
+
+def distinct_rows(rows):
+    """
+    Drops repeated rows, keeping the first of each, in the order they come.
+    Rows stream through a set of the rows seen so far. Once that set passes
+    _DISTINCT_MEMORY bytes (sampled estimate), the rest go to distinct_spilled
+    """
+    rows = iter(rows)
+    seen = set()
+    used = 0
+    rowsize = 0
+    for row in rows:
+        if row in seen:
             continue
+        if not len(seen) % 64:
+            rowsize = row_size(row)
+        seen.add(row)
+        used += rowsize
+        yield row
+        if used >= _DISTINCT_MEMORY:
+            yield from distinct_spilled(rows, seen)
+            return
 
-        if query[0] in (string.ascii_letters + "_"):
-            
-            # convert some keywords for simplicity
-            if query[0:6] == 'IS NOT':
-                tokens.append('!=')
-                query = query[6:]
+
+def distinct_spilled(rows, seen: set):
+    """
+    DISTINCT for the rows left after the in-memory set filled up.
+    Rows not in seen are numbered and hashed into _DISTINCT_PARTITIONS spill files,
+    so copies of a row always share a file. Each file is deduplicated on its own,
+    then the files are merged back by number, which restores first-seen order.
+    """
+    parts = [tempfile.TemporaryFile() for p in range(_DISTINCT_PARTITIONS)]
+    buffers = [[] for p in range(_DISTINCT_PARTITIONS)]
+    for seq, row in enumerate(rows):
+        if row in seen:
+            continue
+        p = hash(row) % _DISTINCT_PARTITIONS
+        buffers[p].append((seq, row))
+        if len(buffers[p]) >= _SPILL_ROWS:
+            pickle.dump(buffers[p], parts[p], pickle.HIGHEST_PROTOCOL)
+            buffers[p] = []
+    seen.clear()  # every row left to output is in the spill files now
+
+    runs = []
+    for p in range(_DISTINCT_PARTITIONS):
+        if buffers[p]:
+            pickle.dump(buffers[p], parts[p], pickle.HIGHEST_PROTOCOL)
+        firsts = {}  # key = row, value = number of its first copy, in the order they were first seen
+        for seq, row in read_spill(parts[p]):
+            if row not in firsts:
+                firsts[row] = seq
+        runs.append(spill([(seq, row) for row, seq in firsts.items()]))
+
+    for seq, row in heapq.merge(*[read_spill(fp) for fp in runs], key=itemgetter(0)):
+        yield row
+
+
+##################################################
+##################################################
+##########                              ##########
+##########          AGGREGATES          ##########
+##########                              ##########
+##################################################
+##################################################
+
+# an aggregate in a query is an (function, column) pair, FN(*) has the column <table>.*
+# aggregates skip NULLs like sqlite: COUNT counts the rest, SUM, AVG, MIN and MAX
+# of no values are NULL (COUNT(*) counts every row)
+
+_AGGREGATES = ('COUNT', 'SUM', 'AVG', 'MIN', 'MAX')
+_NUMERIC_TEXT = re.compile(r'[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]+)?')
+
+
+def parse_item(tokens: list, i: int):
+    # a column name at tokens[i], or an (aggregate, column) pair for FN(column).
+    # returns (item, index of its last token)
+    if tokens[i] in _AGGREGATES and tokens[i+1] == '(':
+        return (tokens[i], tokens[i+2]), i + 3
+    return tokens[i], i
+
+
+def aggregate_key(item, cols: list):
+    # (function, column position) for an aggregate item, the position is None for FN(*)
+    fn, col = item
+    if col == '*' or col.endswith('.*'):
+        return fn, None
+    return fn, column_position(cols, col)
+
+
+def index_aggregates(table: 'Table', items: list, cols: list):
+    """
+    For a select list made only of MIN and MAX on indexed columns, returns their
+    (function, index) pairs, each answered by one end of the index's sorted keys
+    without reading a row. None if some item can't be answered that way.
+    """
+    ends = []
+    for item in items:
+        if isinstance(item, str) or item[0] not in ('MIN', 'MAX'):
+            return None
+        fn, pos = aggregate_key(item, cols)
+        index = table.grab_index(pos) if pos != None else None
+        if index == None:
+            return None
+        ends.append((fn, index))
+    return ends
+
+
+def numeric_value(text: str):
+    """
+    A text value as SUM and AVG add it up, converted the way sqlite does: text that
+    reads as an integer or a real becomes one, any other text counts as its leading
+    number as a real, 0.0 if it has none
+    """
+    text = text.strip()
+    m = _NUMERIC_TEXT.match(text)
+    if not m:
+        return 0.0
+    if m.end() == len(text) and m.group(2) == None and m.group(3) == None:
+        return int(text)
+    return float(m.group())
+
+
+def aggregate_rows(rows, groups: list, aggs: list, width: int):
+    """
+    Hash aggregation, one pass over rows and O(groups) memory.
+    groups : positions of the GROUP BY columns, [] for a single group of every row
+    aggs   : (function, column position) pairs, see aggregate_key
+    width  : number of columns in a row
+    Yields one row per group, in GROUP BY order like sqlite: the aggregate values
+    followed by a row of the group, so other columns can still be selected. That row
+    is the one holding the MIN/MAX if there is exactly one of those, otherwise the last.
+    """
+    keyof = itemgetter(*groups) if groups else (lambda row: None)
+    minmax = [j for j in range(len(aggs)) if aggs[j][0] in ('MIN', 'MAX')]
+    pick = minmax[0] if len(minmax) == 1 else None
+    states = {}  # key = group values, value = [row of the group, [total, count, best] per aggregate]
+    for row in rows:
+        key = keyof(row)
+        state = states.get(key)
+        if state == None:
+            state = states[key] = [row] + [[0, 0, None] for agg in aggs]
+        for j in range(len(aggs)):
+            fn, c = aggs[j]
+            acc = state[j + 1]
+            if c == None:
+                acc[1] += 1  # FN(*)
                 continue
-            if query[0:2] == 'IS':
-                tokens.append('=')
-                query = query[2:]
+            value = row[c]
+            if value == None:
                 continue
-            if query[0:4] == 'NULL':
-                tokens.append(None)
-                query = query[4:]
+            acc[1] += 1
+            if fn == 'SUM' or fn == 'AVG':
+                acc[0] += numeric_value(value) if isinstance(value, str) else value
+            elif fn == 'MIN' or fn == 'MAX':
+                vkey = value_key(value)
+                if acc[1] == 1 or (vkey < acc[0] if fn == 'MIN' else acc[0] < vkey):
+                    acc[0] = vkey
+                    acc[2] = value
+                    if j == pick:
+                        state[0] = row
+        if pick == None:
+            state[0] = row
+
+    if not states and not groups:
+        # an aggregate over no rows is still one row
+        states[None] = [(None,) * width] + [[0, 0, None] for agg in aggs]
+    keys = list(states)
+    if groups:
+        if len(groups) == 1:
+            keys.sort(key=value_key)
+        else:
+            keys.sort(key=lambda key: tuple([value_key(v) for v in key]))
+    for key in keys:
+        state = states[key]
+        values = []
+        for j in range(len(aggs)):
+            fn = aggs[j][0]
+            total, count, best = state[j + 1]
+            if fn == 'COUNT':
+                values.append(count)
+            elif not count:
+                values.append(None)
+            elif fn == 'SUM':
+                values.append(total)
+            elif fn == 'AVG':
+                values.append(total / count)
+            else:
+                values.append(best)
+        yield tuple(values) + tuple(state[0])
+
+##################################################
+##################################################
+##########                              ##########
+##########          PREDICATES          ##########
+##########                              ##########
+##################################################
+##################################################
+
+# a WHERE condition is parsed into a tree of tuples
+#   ('cmp', column, op, value)          op is one of = != < > <= >=, value None means IS (NOT) NULL
+#   ('in', column, [values])
+#   ('between', column, low, high)
+#   ('not', node)   ('and', left, right)   ('or', left, right)
+# in HAVING a column may be an (aggregate, column) pair instead of a name
+# the left side of a comparison is always a column and the right side a literal,
+# so a text literal can never be mistaken for a column or a keyword.
+#
+# trees are compiled into closures that give True, False or None (unknown) per row,
+# following SQL: a comparison with NULL is unknown, NOT unknown is unknown, and a
+# row only passes WHERE if its condition is True
+
+_COMPARE = {'=': eq, '!=': ne, '<': lt, '>': gt, '<=': le, '>=': ge}
+_INDEX_PREFERENCE = {'=': 0, '<': 1, '>': 1, '<=': 1, '>=': 1, '!=': 2}  # lower is tried first
+
+
+def compare_mixed(fn, value, literal):
+    # fn(value, literal) for a number and a text python can't compare, in sqlite's
+    # order where every number is less than every text
+    return fn(value_key(value), value_key(literal))
+
+
+def parse_where(tokens: list, i: int):
+    # parses the condition starting at tokens[i], up to the next clause or the end of the statement
+    tree, i = parse_or(tokens, i)
+    if i < len(tokens) and tokens[i] not in ('GROUP', 'HAVING', 'ORDER', 'LIMIT', ';'):
+        raise Exception(f"unexpected {tokens[i]} in condition")
+    return tree
+
+
+def parse_or(tokens, i):
+    left, i = parse_and(tokens, i)
+    while i < len(tokens) and tokens[i] == 'OR':
+        right, i = parse_and(tokens, i + 1)
+        left = ('or', left, right)
+    return left, i
+
+
+def parse_and(tokens, i):
+    left, i = parse_not(tokens, i)
+    while i < len(tokens) and tokens[i] == 'AND':
+        right, i = parse_not(tokens, i + 1)
+        left = ('and', left, right)
+    return left, i
+
+
+def parse_not(tokens, i):
+    if tokens[i] == 'NOT':
+        node, i = parse_not(tokens, i + 1)
+        return ('not', node), i
+    if tokens[i] == '(':
+        node, i = parse_or(tokens, i + 1)
+        if tokens[i] != ')':
+            raise Exception("missing ) in WHERE")
+        return node, i + 1
+    return parse_test(tokens, i)
+
+
+def parse_test(tokens, i):
+    # column op literal, column [NOT] IN (literals), column [NOT] BETWEEN literal AND literal.
+    # in HAVING the column can also be an aggregate
+    col, i = parse_item(tokens, i)
+    negate = tokens[i+1] == 'NOT'
+    i += 1 + negate
+    op = tokens[i]
+    if op == 'IN':
+        if tokens[i+1] != '(':
+            raise Exception("expected ( after IN")
+        values = []
+        i += 2
+        while True:
+            values.append(tokens[i])
+            if tokens[i+1] == ',':
+                i += 2
                 continue
+            if tokens[i+1] != ')':
+                raise Exception("missing ) after IN")
+            break
+        node, i = ('in', col, values), i + 2
+    elif op == 'BETWEEN':
+        if tokens[i+2] != 'AND':
+            raise Exception("expected AND in BETWEEN")
+        node, i = ('between', col, tokens[i+1], tokens[i+3]), i + 4
+    elif op in _COMPARE and not negate:
+        node, i = ('cmp', col, op, tokens[i+1]), i + 2
+    else:
+        raise Exception(f"unexpected {op} in WHERE")
+    return (('not', node) if negate else node), i
+
+
+def tree_columns(tree):
+    # every column the condition tree refers to
+    if tree[0] == 'not':
+        return tree_columns(tree[1])
+    if tree[0] in ('and', 'or'):
+        return tree_columns(tree[1]) + tree_columns(tree[2])
+    return [tree[1]]
+
+
+def map_columns(tree, fn):
+    # the same condition tree with every column replaced by fn(column)
+    if tree[0] == 'not':
+        return ('not', map_columns(tree[1], fn))
+    if tree[0] in ('and', 'or'):
+        return (tree[0], map_columns(tree[1], fn), map_columns(tree[2], fn))
+    return (tree[0], fn(tree[1])) + tree[2:]
+
+
+def affinity_literal(value, ctype: str):
+    # value as sqlite compares it with a column of type ctype: the column's affinity turns a
+    # number into text for a TEXT column, and text that reads as a number into that number
+    # for an INTEGER or REAL one
+    if ctype == 'TEXT' and isinstance(value, (int, float)):
+        return str(value)
+    if ctype in ('INTEGER', 'REAL') and isinstance(value, str) and _NUMERIC_TEXT.fullmatch(value.strip()):
+        return numeric_value(value)
+    return value
+
+
+def apply_affinity(tree, cols: list, types: list):
+    # the same condition tree with each literal converted by affinity_literal for its column
+    kind = tree[0]
+    if kind == 'not':
+        return ('not', apply_affinity(tree[1], cols, types))
+    if kind in ('and', 'or'):
+        return (kind, apply_affinity(tree[1], cols, types), apply_affinity(tree[2], cols, types))
+    ctype = types[column_position(cols, tree[1])]
+    if kind == 'in':
+        return ('in', tree[1], [affinity_literal(v, ctype) for v in tree[2]])
+    if kind == 'between':
+        return ('between', tree[1], affinity_literal(tree[2], ctype), affinity_literal(tree[3], ctype))
+    return ('cmp', tree[1], tree[2], affinity_literal(tree[3], ctype))
+
+
+def column_position(cols: list, name: str):
+    # position of column name in cols, either of them may be qualified with a table name
+    if name in cols:
+        return cols.index(name)
+    short = name[name.find('.')+1:]
+    for i in range(len(cols)):
+        if cols[i][cols[i].find('.')+1:] == short:
+            return i
+    raise Exception(f"no such column: {name}")
+
+
+def index_condition(tree, table: 'Table', cols: list):
+    """
+    Finds a comparison the whole condition depends on (the tree itself or one side
+    of an AND) on a column table has an index for. Like sqlite, an = is picked over
+    a range and a range over a !=, then an index on a number column over the wider
+    one on a text column, and between equals the index created last.
+    returns (index, op, value) or None
+    """
+    found = index_conditions(tree, table, cols)
+    if not found:
+        return None
+    created = list(table.indexes().values())
+    types = [col[1] for col in table.grab_cols()]
+    def cost(cond):
+        index = cond[0]
+        return _INDEX_PREFERENCE[cond[1]], types[index.column()] == 'TEXT', -created.index(index)
+    return min(found, key=cost)
+
+
+def index_conditions(tree, table: 'Table', cols: list):
+    # every comparison index_condition can choose from, as (index, op, value)
+    if tree[0] == 'and':
+        return index_conditions(tree[1], table, cols) + index_conditions(tree[2], table, cols)
+    if tree[0] == 'cmp':
+        index = table.grab_index(column_position(cols, tree[1]))
+        if index:
+            return [(index, tree[2], tree[3])]
+    return []
+
+
+def compile_predicate(tree, cols: list):
+    # returns a function row -> True, False or None
+    kind = tree[0]
+    if kind == 'and':
+        left = compile_predicate(tree[1], cols)
+        right = compile_predicate(tree[2], cols)
+        def test(row):
+            a = left(row)
+            if a == False:
+                return False
+            b = right(row)
+            if b == False:
+                return False
+            return None if a == None or b == None else True
+        return test
+    if kind == 'or':
+        left = compile_predicate(tree[1], cols)
+        right = compile_predicate(tree[2], cols)
+        def test(row):
+            a = left(row)
+            if a:
+                return True
+            b = right(row)
+            if b:
+                return True
+            return None if a == None or b == None else False
+        return test
+    if kind == 'not':
+        inner = compile_predicate(tree[1], cols)
+        def test(row):
+            a = inner(row)
+            return None if a == None else not a
+        return test
+
+    c = column_position(cols, tree[1])
+    if kind == 'cmp' and tree[3] != None:
+        # the common case, inlined to save a call per row
+        fn = _COMPARE[tree[2]]
+        literal = tree[3]
+        def test(row):
+            value = row[c]
+            if value == None:
+                return None
+            try:
+                return fn(value, literal)
+            except TypeError:
+                return compare_mixed(fn, value, literal)
+        return test
+    value_test = compile_value_test(tree)
+    return lambda row: value_test(row[c])
+
+
+def compile_value_test(tree):
+    # for a cmp, in or between node, returns a function column value -> True, False or None
+    kind = tree[0]
+    if kind == 'in':
+        values = {v for v in tree[2] if v != None}
+        unknown = None if None in tree[2] else False  # x IN (..., NULL) is never False
+        def test(value):
+            if value == None:
+                return None
+            return True if value in values else unknown
+        return test
+    if kind == 'between':
+        low, high = tree[2], tree[3]
+        def test(value):
+            if value == None or low == None or high == None:
+                return None
+            try:
+                return low <= value <= high
+            except TypeError:
+                return compare_mixed(le, low, value) and compare_mixed(le, value, high)
+        return test
+
+    op, literal = tree[2], tree[3]
+    if literal == None:
+        # IS NULL / IS NOT NULL
+        if op == '=':
+            return lambda value: value == None
+        if op == '!=':
+            return lambda value: value != None
+        return lambda value: None  # x < NULL and the like are never true
+    fn = _COMPARE[op]
+    def test(value):
+        if value == None:
+            return None
+        try:
+            return fn(value, literal)
+        except TypeError:
+            return compare_mixed(fn, value, literal)
+    return test
 
-            query = remove_word(query, tokens)
-            continue
 
-        if query[0] in "(),;*><=":
-            tokens.append(query[0])
-            query = query[1:]
-            continue
+def compile_batch(tree, cols: list):
+    """
+    Batch version of compile_predicate, returns a function that takes a batch of
+    columns and gives the list of True/False/None for its rows, evaluating each
+    node over a whole column instead of calling a closure per row
+    """
+    kind = tree[0]
+    if kind in ('and', 'or'):
+        left = compile_batch(tree[1], cols)
+        right = compile_batch(tree[2], cols)
+        both = and_ if kind == 'and' else or_
+        def test(columns):
+            a = left(columns)
+            b = right(columns)
+            if None not in a and None not in b:
+                return list(map(both, a, b))
+            if kind == 'and':
+                return [False if x == False or y == False else (None if x == None or y == None else True)
+                        for x, y in zip(a, b)]
+            return [True if x or y else (None if x == None or y == None else False) for x, y in zip(a, b)]
+        return test
+    if kind == 'not':
+        inner = compile_batch(tree[1], cols)
+        def test(columns):
+            mask = inner(columns)
+            if None not in mask:
+                return list(map(not_, mask))
+            return [None if x == None else not x for x in mask]
+        return test
+
+    # without NULLs in the batch, cmp, in and between run over the whole column in C,
+    # otherwise (or when numbers meet text, which python can't compare) value_test goes through it
+    # value by value
+    c = column_position(cols, tree[1])
+    value_test = compile_value_test(tree)
+    if kind == 'cmp' and tree[3] != None:
+        fn = _COMPARE[tree[2]]
+        literal = tree[3]
+        def fast(column):
+            return list(map(fn, column, repeat(literal)))
+    elif kind == 'in' and None not in tree[2]:
+        values = set(tree[2])
+        def fast(column):
+            return list(map(values.__contains__, column))
+    elif kind == 'between' and tree[2] != None and tree[3] != None:
+        low, high = tree[2], tree[3]
+        def fast(column):
+            return list(map(and_, map(le, repeat(low), column), map(le, column, repeat(high))))
+    else:
+        return lambda columns: list(map(value_test, columns[c]))
+
+    def test(columns):
+        column = columns[c]
+        if isinstance(column, array) or None not in column:  # an array never holds NULLs
+            try:
+                return fast(column)
+            except TypeError:
+                pass
+        return list(map(value_test, column))
+    return test
 
-        if query[0] in '!' and query[1] in '=':
-            tokens.append(query[:2])
-            query = query[2:]
+##################################################
+##################################################
+##########                              ##########
+##########         FILE FORMAT          ##########
+##########                              ##########
+##################################################
+##################################################
+
+# Binary .db file, all numbers little endian
+#
+#   header   : magic, version, flags, table count, catalog offset,
+#              salt (matches the write-ahead log built on this file, 0 if none)   (_FILE_HEADER)
+#   data     : one block per table, columns one after the other, each column
+#              split into pages of up to _FILE_PAGE_ROWS values
+#   catalog  : per table (in data order)
+#                name, columnar flag, column count,
+#                per column: name, type, default value,
+#                index count, per index: name, column position,
+#                row count, data block offset, data block length
+#
+#   page     : kind, row count, payload length   (_PAGE_HEADER)
+#              null bitmap, one bit per row (set = NULL)
+#              payload, by kind
+#                'q' : int64 per row (0 for NULL)
+#                'd' : float64 per row (0.0 for NULL)
+#                's' : int64 end offset per row, then the utf-8 text of all rows
+#                'v' : tagged values, used when a column doesn't fit its type's layout
+
+_FILE_MAGIC = b'PYSQLDB\x00'
+_FILE_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sHHIQQ')
+_PAGE_HEADER = struct.Struct('<cII')
+
+# tags for single values (defaults and 'v' pages)
+_VAL_NULL, _VAL_INT, _VAL_REAL, _VAL_TEXT, _VAL_BIGINT = range(5)
+
+
+def pack_str(text: str):
+    data = text.encode('utf-8')
+    return struct.pack('<I', len(data)) + data
+
+
+def pack_value(value):
+    if value == None:
+        return bytes([_VAL_NULL])
+    if isinstance(value, float):
+        return bytes([_VAL_REAL]) + struct.pack('<d', value)
+    if isinstance(value, int):
+        if -(1 << 63) <= value < (1 << 63):
+            return bytes([_VAL_INT]) + struct.pack('<q', value)
+        return bytes([_VAL_BIGINT]) + pack_str(str(value))
+    return bytes([_VAL_TEXT]) + pack_str(value)
+
+
+def le_bytes(arr):
+    # array contents in little endian order
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def pack_page(values: list, type: str):
+    n = len(values)
+    nulls = bytearray((n + 7) // 8)
+    for i in range(n):
+        if values[i] == None:
+            nulls[i >> 3] |= 1 << (i & 7)
+
+    kind = b'v'
+    payload = None
+    try:
+        if type == 'INTEGER':
+            payload = le_bytes(array('q', [0 if v == None else v for v in values]))
+            kind = b'q'
+        elif type == 'REAL':
+            payload = le_bytes(array('d', [0.0 if v == None else v for v in values]))
+            kind = b'd'
+        elif type == 'TEXT':
+            texts = [b'' if v == None else v.encode('utf-8') for v in values]
+            ends = array('q')
+            end = 0
+            for text in texts:
+                end += len(text)
+                ends.append(end)
+            payload = le_bytes(ends) + b''.join(texts)
+            kind = b's'
+    except (OverflowError, TypeError, AttributeError):
+        kind = b'v'  # a value that doesn't fit the column's layout
+    if kind == b'v':
+        payload = b''.join(pack_value(v) for v in values)
+    return _PAGE_HEADER.pack(kind, n, len(payload)) + bytes(nulls) + payload
+
+
+class FileReader(object):
+    # reads the pieces of a binary .db file from a buffer (usually an mmap)
+    def __init__(self, buf, pos: int = 0):
+        self.__buf = buf
+        self.__pos = pos
+
+    def pos(self):
+        return self.__pos
+
+    def unpack(self, fmt: struct.Struct):
+        values = fmt.unpack_from(self.__buf, self.__pos)
+        self.__pos += fmt.size
+        return values
+
+    def number(self, fmt: str):
+        value = struct.unpack_from('<' + fmt, self.__buf, self.__pos)[0]
+        self.__pos += struct.calcsize('<' + fmt)
+        return value
+
+    def raw(self, n: int):
+        data = self.__buf[self.__pos:self.__pos + n]
+        self.__pos += n
+        return data
+
+    def str(self):
+        return self.raw(self.number('I')).decode('utf-8')
+
+    def value(self):
+        tag = self.number('B')
+        if tag == _VAL_NULL:
+            return None
+        if tag == _VAL_INT:
+            return self.number('q')
+        if tag == _VAL_REAL:
+            return self.number('d')
+        if tag == _VAL_BIGINT:
+            return int(self.str())
+        return self.str()
+
+    def array(self, typecode: str, n: int):
+        arr = array(typecode)
+        arr.frombytes(self.raw(n * arr.itemsize))
+        if sys.byteorder == 'big':
+            arr.byteswap()
+        return arr
+
+    def page(self):
+        # returns the values of the page as a list, NULLs as None
+        kind, n, length = self.unpack(_PAGE_HEADER)
+        nulls = self.raw((n + 7) // 8)
+        if kind == b'v':
+            return [self.value() for i in range(n)]
+        if kind == b's':
+            ends = self.array('q', n)
+            text = self.raw(length - n * 8)
+            values = []
+            start = 0
+            for end in ends:
+                values.append(text[start:end].decode('utf-8'))
+                start = end
+        else:
+            values = self.array(kind.decode(), n).tolist()
+        if any(nulls):
+            for i in range(n):
+                if nulls[i >> 3] & (1 << (i & 7)):
+                    values[i] = None
+        return values
+
+
+def pack_catalog_entry(name: str, columnar: bool, cols: list, indexes: list, count: int, start: int, length: int):
+    """
+    cols    : (name, type, default) per column
+    indexes : (index name, column position) per index
+    """
+    entry = bytearray(pack_str(name))
+    entry += struct.pack('<BH', columnar, len(cols))
+    for col in cols:  # 0: colname  1: types  2: defaults
+        entry += pack_str(col[0]) + pack_str(col[1]) + pack_value(col[2])
+    entry += struct.pack('<H', len(indexes))
+    for index_name, col in indexes:
+        entry += pack_str(index_name) + struct.pack('<H', col)
+    entry += struct.pack('<QQQ', count, start, length)
+    return entry
+
+
+def write_database(db: 'Database', fp, salt: int = 0):
+    """
+    Writes every table of db to the open binary file fp (see FILE FORMAT above).
+    Tables that were never loaded from their file are copied over as raw bytes.
+    salt : ties the file to its write-ahead log, 0 if there is none
+    """
+    fp.write(bytes(_FILE_HEADER.size))  # header is filled in once the catalog is written
+    catalog = bytearray()
+    names = db.tables()
+    for name in names:
+        lazy = db.grab_lazy(name)
+        start = fp.tell()
+        if lazy:
+            fp.write(lazy.raw())
+            catalog += lazy.catalog_entry(start)
             continue
 
-        if query[0] == "'":
-            query = remove_text(query, tokens)
+        table = db.grab_table(name)
+        cols = table.grab_cols()
+        count = table.count()
+        for c in range(len(cols)):
+            values = table.grab_column(c)
+            for p in range(0, count, _FILE_PAGE_ROWS):
+                fp.write(pack_page(values[p:p + _FILE_PAGE_ROWS], cols[c][1]))
+        indexes = [(index.name(), index.column()) for index in table.indexes().values()]
+        catalog += pack_catalog_entry(name, table.columnar(), cols, indexes, count, start, fp.tell() - start)
+
+    offset = fp.tell()
+    fp.write(catalog)
+    fp.seek(0)
+    fp.write(_FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, 0, len(names), offset, salt))
+
+
+def read_header(buf):
+    # returns (magic, version, flags, table count, catalog offset, salt)
+    header = FileReader(buf).unpack(_FILE_HEADER)
+    if header[0] != _FILE_MAGIC or header[1] > _FILE_VERSION:
+        raise Exception("not a database file this version can read")
+    return header
+
+
+def read_catalog(buf):
+    """
+    Reads the header and catalog of a binary .db file.
+    Returns a list of dicts, one per table, with the catalog fields
+        name, columnar, cols [(name, type, default)], indexes [(name, col)], count, start, length
+    """
+    magic, version, flags, ntables, offset, salt = read_header(buf)
+
+    entries = []
+    catalog = FileReader(buf, offset)
+    for t in range(ntables):
+        entry = {'name': catalog.str()}
+        columnar, ncols = catalog.unpack(struct.Struct('<BH'))
+        entry['columnar'] = bool(columnar)
+        entry['cols'] = []
+        for c in range(ncols):
+            entry['cols'].append((catalog.str(), catalog.str(), catalog.value()))
+        entry['indexes'] = []
+        for i in range(catalog.number('H')):
+            entry['indexes'].append((catalog.str(), catalog.number('H')))
+        entry['count'], entry['start'], entry['length'] = catalog.unpack(struct.Struct('<QQQ'))
+        entries.append(entry)
+    return entries
+
+
+def load_table(buf, entry: dict) -> 'Table':
+    # builds the Table described by a catalog entry, pages go straight
+    # into storage, no tokenizing and no per row checks
+    cols = [col[0] for col in entry['cols']]
+    types = [col[1] for col in entry['cols']]
+    defaults = [col[2] for col in entry['cols']]
+
+    data = FileReader(buf, entry['start'])
+    columns = []
+    for c in range(len(cols)):
+        values = []
+        while len(values) < entry['count']:
+            values += data.page()
+        columns.append(values)
+    table = Table(cols, types, defaults, entry['columnar'])
+    table.load_columns(columns)
+    for index_name, col in entry['indexes']:
+        table.create_index(index_name, cols[col])
+    return table
+
+
+def read_database(buf, db: 'Database', lazy: bool = False):
+    """
+    Loads every table stored in buf (a binary .db file) into db.
+    lazy : if True, tables are only registered and get loaded from buf on first use,
+           so buf has to stay open
+    """
+    for entry in read_catalog(buf):
+        if lazy:
+            db.add_lazy_table(LazyTable(buf, entry))
+        else:
+            db.create_table(entry['name'], load_table(buf, entry))
+
+
+class LazyTable(object):
+    # a table that is still sitting in a memory-mapped .db file
+    def __init__(self, buf, entry: dict):
+        self.__buf = buf
+        self.__entry = entry
+        self.__table = None  # the loaded table, kept so every database copy shares its pages
+
+    def name(self):
+        return self.__entry['name']
+
+    def index_names(self):
+        return [index[0] for index in self.__entry['indexes']]
+
+    def table(self) -> 'Table':
+        # loads the table on first call, every call returns a copy-on-write clone
+        if not self.__table:
+            self.__table = load_table(self.__buf, self.__entry)
+        return self.__table.clone()
+
+    def raw(self):
+        # the table's data block, exactly as stored
+        start = self.__entry['start']
+        return self.__buf[start:start + self.__entry['length']]
+
+    def catalog_entry(self, start: int):
+        # catalog entry for the same data block written at a new offset
+        entry = self.__entry
+        return pack_catalog_entry(entry['name'], entry['columnar'], entry['cols'], entry['indexes'],
+                                  entry['count'], start, entry['length'])
+
+##################################################
+##################################################
+##########                              ##########
+##########       WRITE-AHEAD LOG        ##########
+##########                              ##########
+##################################################
+##################################################
+
+# <database file>-wal, appended to on every commit and emptied by checkpoints
+#
+#   header : magic, salt of the main file it builds on   (_WAL_HEADER)
+#   record : payload length, crc32 of payload             (_WAL_RECORD)
+#            payload: statement count, then for each statement
+#                     its text (see pack_str), parameter row count,
+#                     per row: value count, each value (see pack_value)
+#
+# a record is one committed unit (a statement, or a whole transaction).
+# a torn or corrupt record ends the log, it and anything after it is dropped
+
+_WAL_MAGIC = b'PYSQLWL2'  # 2: statements carry their parameter rows
+_WAL_HEADER = struct.Struct('<8sQ')
+_WAL_RECORD = struct.Struct('<II')
+
+
+class WriteAheadLog(object):
+    def __init__(self, path: str):
+        self.__path = path
+        self.__salt = None  # salt of the main file, None until the log can be used
+        self.__fp = None
+        self.__size = 0
+
+    def salt(self):
+        return self.__salt
+
+    def size(self):
+        return self.__size
+
+    def append(self, statements: list):
+        # statements : (statement, parameter rows or None) pairs
+        assert self.__salt != None
+        if not self.__fp:
+            self.__fp = open(self.__path, 'ab')
+            if self.__fp.tell() == 0:
+                self.__fp.write(_WAL_HEADER.pack(_WAL_MAGIC, self.__salt))
+        parts = [struct.pack('<I', len(statements))]
+        for statement, params in statements:
+            params = params or ()
+            parts.append(pack_str(statement) + struct.pack('<I', len(params)))
+            for row in params:
+                parts.append(struct.pack('<I', len(row)) + b''.join(pack_value(v) for v in row))
+        payload = b''.join(parts)
+        self.__fp.write(_WAL_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.__fp.flush()
+        os.fsync(self.__fp.fileno())
+        self.__size = self.__fp.tell()
+
+    def reset(self, salt):
+        # the main file was rewritten with this salt, everything logged so far is in it
+        if self.__fp:
+            self.__fp.close()
+            self.__fp = None
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+        self.__salt = salt
+        self.__size = 0
+
+    def recover(self, salt):
+        """
+        Returns the (statement, params) lists of every complete record, if the log belongs to
+        the main file with this salt. Anything else in the log is thrown away.
+        """
+        try:
+            with open(self.__path, 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            data = b''
+        if not salt or len(data) < _WAL_HEADER.size or _WAL_HEADER.unpack_from(data) != (_WAL_MAGIC, salt):
+            self.reset(salt if salt else None)
+            return []
+
+        records = []
+        pos = _WAL_HEADER.size
+        while pos + _WAL_RECORD.size <= len(data):
+            length, crc = _WAL_RECORD.unpack_from(data, pos)
+            payload = data[pos + _WAL_RECORD.size:pos + _WAL_RECORD.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break  # torn write from a crash
+            reader = FileReader(payload)
+            statements = []
+            for i in range(reader.number('I')):
+                statement = reader.str()
+                params = [[reader.value() for k in range(reader.number('I'))]
+                          for j in range(reader.number('I'))]
+                statements.append((statement, params or None))
+            records.append(statements)
+            pos += _WAL_RECORD.size + length
+
+        if pos != len(data):
+            with open(self.__path, 'r+b') as fp:
+                fp.truncate(pos)
+        self.__salt = salt
+        self.__size = pos
+        return records
+
+##################################################
+##################################################
+##########                              ##########
+##########       STATEMENT CACHE        ##########
+##########                              ##########
+##################################################
+##################################################
+
+class Statement(object):
+    # a parsed statement: the token list plus where each keyword first shows up,
+    # so execute can find its clauses without rescanning the tokens every time
+    def __init__(self, sql: str):
+        self.__sql = sql
+        self.__tokens = tokenize(sql)
+        self.__first = {}  # key = token, value = index of its first occurrence
+        self.__slots = []  # indexes of the ? placeholders
+        for i in range(len(self.__tokens)):
+            tok = self.__tokens[i]
+            if isinstance(tok, Text):
+                self.__tokens[i] = str(tok)  # a value from here on, never a keyword
+            elif isinstance(tok, str) and tok not in self.__first:
+                self.__first[tok] = i
+            elif tok is _PARAM:
+                self.__slots.append(i)
+        self.__where = None   # parsed WHERE condition, see where()
+        self.__having = None  # parsed HAVING condition, see having()
+
+    def sql(self):
+        return self.__sql
+
+    def tokens(self):
+        return self.__tokens
+
+    def slots(self):
+        return self.__slots
+
+    def bind(self, values) -> 'Statement':
+        """
+        Returns a copy of the statement with its ? placeholders replaced by values,
+        left to right. Only the token list is copied, nothing is tokenized again.
+        """
+        if len(values) != len(self.__slots):
+            raise Exception(f"statement has {len(self.__slots)} parameters but {len(values)} were given")
+        plan = copy.copy(self)
+        plan.__tokens = list(self.__tokens)
+        for i, value in zip(self.__slots, values):
+            plan.__tokens[i] = value
+        plan.__where = None
+        plan.__having = None
+        return plan
+
+    def has(self, tok):
+        # same as `tok in tokens`
+        return tok in self.__first
+
+    def index(self, tok):
+        # same as `tokens.index(tok)`, raises ValueError if missing
+        if tok not in self.__first:
+            raise ValueError(f"{tok} is not in statement")
+        return self.__first[tok]
+
+    def where(self):
+        # the WHERE condition as a tree (see PREDICATES), parsed on first use
+        if self.__where == None:
+            self.__where = parse_where(self.__tokens, self.index('WHERE') + 1)
+        return self.__where
+
+    def having(self):
+        # the HAVING condition, same form as where()
+        if self.__having == None:
+            self.__having = parse_where(self.__tokens, self.index('HAVING') + 1)
+        return self.__having
+
+class StatementCache(object):
+    # LRU cache of parsed statements keyed by sql text
+    def __init__(self, size: int = _STATEMENT_CACHE_SIZE):
+        assert size > 0
+        self.__size = size
+        self.__plans = OrderedDict()  # key = sql text, value = Statement
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, sql: str) -> 'Statement':
+        plan = self.__plans.get(sql)
+        if plan:
+            self.__plans.move_to_end(sql)
+            self.__hits += 1
+            return plan
+        self.__misses += 1
+        plan = Statement(sql)
+        self.__plans[sql] = plan
+        if len(self.__plans) > self.__size:
+            self.__plans.popitem(last=False)  # evict least recently used
+        return plan
+
+    def hits(self):
+        return self.__hits
+
+    def misses(self):
+        return self.__misses
+
+    def size(self):
+        return self.__size
+
+    def clear(self):
+        self.__plans.clear()
+
+
+def bind_rows(plan: 'Statement', rows, kept: list = None, limit: int = None):
+    """
+    Tokens of one INSERT that adds plan's VALUES once for every row of parameters,
+    with its ? placeholders replaced by that row's values, left to right.
+    Rows are pulled from the iterable as the insert asks for tokens.
+    kept  : if given, each row of parameters is appended to it once used
+    limit : if given, kept stops growing at limit + 1 rows, enough to tell there were more
+    """
+    tokens = plan.tokens()
+    start = plan.index('VALUES') + 1
+    end = len(tokens) - (tokens[-1] == ';')
+    slots = [i - start for i in plan.slots()]
+    values = tokens[start:end]
+    yield from tokens[:start]
+    first = True
+    for row in rows:
+        if len(row) != len(slots):
+            raise Exception(f"statement has {len(slots)} parameters but {len(row)} were given")
+        if not first:
+            yield ','
+        first = False
+        for i, value in zip(slots, row):
+            values[i] = value
+        yield from values
+        if kept != None and (limit == None or len(kept) <= limit):
+            kept.append(tuple(row))
+    yield ';'
+
+##################################################
+##################################################
+##########                              ##########
+##########          BULK LOAD           ##########
+##########                              ##########
+##################################################
+##################################################
+
+# Connection.load_rows / load_csv take rows in batches of columns, so type checks
+# and conversions run a column at a time and indexes are updated once at the end
+
+def column_batches(rows, width: int):
+    # turns an iterable of rows into batches of _LOAD_BATCH_SIZE rows, each a list of columns
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, _LOAD_BATCH_SIZE))
+        if not batch:
+            return
+        if any(n != width for n in set(map(len, batch))):
+            raise Exception(f"rows to load must have {width} values")
+        yield list(zip(*batch))
+
+
+def convert_columns(columns: list, types: list):
+    """
+    Converts a batch of text fields (from a CSV file) to the column types, one
+    column at a time. '' is NULL for INTEGER and REAL, a field that doesn't convert
+    is left as text, so the type check that follows drops its row.
+    """
+    converted = []
+    for values, ctype in zip(columns, types):
+        convert = {'INTEGER': int, 'REAL': float}.get(ctype)
+        if convert == None:
+            converted.append(values)
             continue
+        try:
+            if '' in values:
+                raise ValueError
+            converted.append(list(map(convert, values)))
+        except ValueError:
+            converted.append([convert_field(convert, v) for v in values])
+    return converted
+
+
+def convert_field(convert, value: str):
+    # one field, see convert_columns
+    if value == '':
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        return value
+
+##################################################
+##################################################
+##########                              ##########
+##########           TOKENIZE           ##########
+##########                              ##########
+##################################################
+##################################################
 
-        if (query[0] in string.digits) or (query[0] == '-' and query[1] in string.digits):
-            query = remove_number(query, tokens)
+# one pass over the query: each match consumes a single token (or a run of whitespace)
+# order matters, 'IS NOT', 'IS' and 'NULL' are checked before plain words
+_TOKEN_RE = re.compile(r"""
+      (?P<space>[ \t\n\r\x0b\x0c]+)
+    | (?P<isnot>IS\ NOT)
+    | (?P<is>IS)
+    | (?P<null>NULL)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_.*]*)
+    | (?P<param>\?)
+    | (?P<symbol>[(),;*]|<=|>=|!=|[><=])
+    | '(?P<text>[^']*(?:''[^']*)*)'
+    | (?P<number>-?[0-9][0-9.\-]*)
+    """, re.VERBOSE)
 
 
+class Parameter(object):
+    # the ? placeholder token, a value is put in its place by Statement.bind.
+    # not a string, so a '?' text literal is never mistaken for one
+    __slots__ = ()
 
-        if len(query) == len(old_query):
-            print("ERRTOK:", tokens)
-            raise AssertionError(f"Query didn't get shorter.")
+    def __repr__(self):
+        return '?'
+
+_PARAM = Parameter()
+
+
+class Text(str):
+    # a text literal token while a statement is parsed, so a literal like 'ORDER'
+    # is never taken for the keyword. Statement turns them back into plain strings
+    __slots__ = ()
+
+
+def scan(query, literals: bool = False):
+    """
+    Generator over the raw tokens of a query, left to right.
+    Words and symbols are strings, NULL is None, numbers are int/float,
+    text literals are strings with '' unescaped and ? is _PARAM.
+    literals : text literals come out as Text instead of plain strings
+    """
+    pos = 0
+    end = len(query)
+    match = _TOKEN_RE.match
+    while pos < end:
+        m = match(query, pos)
+        if not m:
+            raise AssertionError(f"unable to tokenize query at position {pos}: {query[pos:pos+20]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'space':
+            continue
+        if kind == 'word' or kind == 'symbol':
+            yield m.group()
+        elif kind == 'text':
+            text = m.group('text').replace("''", "'")
+            yield Text(text) if literals else text
+        elif kind == 'number':
+            text = m.group()
+            if '.' in text:
+                yield float(text)
+            else:
+                yield int(text)
+        elif kind == 'param':
+            yield _PARAM
+        elif kind == 'isnot':
+            yield '!='
+        elif kind == 'is':
+            yield '='
+        else:  # null
+            yield None
+
+
+def tokenize(query):
+    # text literals stay Text (see Statement), words leaves them out of keyword searches
+    tokens = list(scan(query, True))
+    words = [None if isinstance(tok, Text) else tok for tok in tokens]
 
     # add qualifications (helps lower complexity on execute)
-    if 'FROM' in tokens or 'UPDATE' in tokens:
-        if 'UPDATE' in tokens:
+    if 'FROM' in words or 'UPDATE' in words:
+        if 'UPDATE' in words:
             master = tokens[1]
         else:
-            master = tokens[tokens.index('FROM') + 1]
+            master = tokens[words.index('FROM') + 1]
         if 'SELECT' == tokens[0]:
-            i = 1 + ('DISTINCT' in tokens) + (2 * (('MAX' in tokens) + ('MIN' in tokens)))
+            i = 1 + ('DISTINCT' in words)
             while True:
+                if tokens[i] in _AGGREGATES and tokens[i+1] == '(':
+                    i += 2  # qualify the aggregate's column
                 v = tokens[i]
                 if '.' not in v:
                     tokens[i] = master + '.' + v
+                if tokens[i+1] == ')':
+                    i += 1
                 if tokens[i+1] == ',':
                     i += 2
                     continue
                 break
-            i = tokens.index('BY') + 1
-            while True:
+            i = words.index('ORDER') + 2 if 'ORDER' in words else len(tokens)  # ORDER BY is optional
+            while i < len(tokens):
+                if tokens[i] in _AGGREGATES and tokens[i+1] == '(':
+                    i += 2
                 v = tokens[i]
                 if '.' not in v:
                     tokens[i] = master + '.' + v
+                if tokens[i+1] == ')':
+                    i += 1
+                if tokens[i+1] in ('ASC', 'DESC'):
+                    i += 1
                 if tokens[i+1] == ',':
                     i += 2
                     continue
                 break
-        if 'WHERE' in tokens:
-            v = tokens[tokens.index('WHERE') + 1]
-            if '.' not in v:
-                tokens[tokens.index('WHERE') + 1] = master + '.' + v
     #print("Tokens:", tokens)
     return tokens
 
-def connect(filename, timeout = 0.1, isolation_level = None):
+def connect(filename, timeout = 0.1, isolation_level = None, columnar = False, lazy = False):
     """
     Creates a Connection object with the given filename
+    columnar : if True, tables created through this connection store their data by column
+    lazy     : if True, tables in the file are only loaded when a statement first uses them
     """
-    return Connection(filename)
\ No newline at end of file
+    return Connection(filename, columnar, lazy)
\ No newline at end of file
@@ -0,0 +1,13 @@
+CREATE TABLE t (a INTEGER, b TEXT);
+INSERT INTO t VALUES (1, 'one'), (2, 'two');
+SELECT * FROM t;
+SELECT b FROM t WHERE a = 1;
+INSERT INTO t VALUES (1, 'one'), (2, 'two');
+SELECT * FROM t;
+SELECT b FROM t WHERE a = 1;
+DROP TABLE t;
+CREATE TABLE t (b TEXT, c REAL, a INTEGER);
+INSERT INTO t VALUES ('x', 1.5, 1), ('y', 2.5, 3);
+SELECT * FROM t;
+SELECT b FROM t WHERE a = 1;
+SELECT * FROM t;
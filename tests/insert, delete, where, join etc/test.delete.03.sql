@@ -0,0 +1,14 @@
+CREATE TABLE t (id INTEGER, k INTEGER, s TEXT);
+INSERT INTO t VALUES (0, NULL, 'n0'), (1, 1, 'n1'), (2, 2, 'n2'), (3, 3, 'n3'), (4, 4, 'n4'), (5, 5, 'n0'), (6, 6, 'n1'), (7, 0, 'n2'), (8, 1, 'n3'), (9, NULL, 'n4'), (10, 3, 'n0'), (11, 4, 'n1'), (12, 5, 'n2'), (13, 6, 'n3'), (14, 0, 'n4'), (15, 1, 'n0'), (16, 2, 'n1'), (17, 3, 'n2'), (18, NULL, 'n3'), (19, 5, 'n4'), (20, 6, 'n0'), (21, 0, 'n1'), (22, 1, 'n2'), (23, 2, 'n3'), (24, 3, 'n4'), (25, 4, 'n0'), (26, 5, 'n1'), (27, NULL, 'n2'), (28, 0, 'n3'), (29, 1, 'n4'), (30, 2, 'n0'), (31, 3, 'n1'), (32, 4, 'n2'), (33, 5, 'n3'), (34, 6, 'n4'), (35, 0, 'n0'), (36, NULL, 'n1'), (37, 2, 'n2'), (38, 3, 'n3'), (39, 4, 'n4'), (40, 5, 'n0'), (41, 6, 'n1'), (42, 0, 'n2'), (43, 1, 'n3'), (44, 2, 'n4'), (45, NULL, 'n0'), (46, 4, 'n1'), (47, 5, 'n2'), (48, 6, 'n3'), (49, 0, 'n4'), (50, 1, 'n0'), (51, 2, 'n1'), (52, 3, 'n2'), (53, 4, 'n3'), (54, NULL, 'n4'), (55, 6, 'n0'), (56, 0, 'n1'), (57, 1, 'n2'), (58, 2, 'n3'), (59, 3, 'n4');
+DELETE FROM t WHERE k = 3;
+SELECT COUNT(*), SUM(id) FROM t;
+UPDATE t SET k = 3, s = 'moved' WHERE k > 4;
+SELECT id, k, s FROM t WHERE k = 3 ORDER BY id;
+DELETE FROM t WHERE k != 3 AND s = 'n2';
+UPDATE t SET s = 'none' WHERE k IS NULL;
+SELECT * FROM t WHERE s = 'none' OR id < 5 ORDER BY id;
+DELETE FROM t WHERE id >= 30;
+UPDATE t SET k = 0 WHERE id = 1000;
+SELECT s, COUNT(*) FROM t GROUP BY s ORDER BY s;
+DELETE FROM t WHERE k IS NOT NULL;
+SELECT * FROM t ORDER BY id;
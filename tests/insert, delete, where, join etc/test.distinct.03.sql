@@ -0,0 +1,8 @@
+CREATE TABLE movies (name TEXT, genre TEXT, rating REAL);
+INSERT INTO movies VALUES ('The Matrix', 'action', 5.0), ('James Bond', 'action', 6.0), ('The Conjuring', NULL, 0.0), ('La La Land', 'romance', NULL);
+INSERT INTO movies VALUES ('The Matrix', 'action', 5.0), ('James Bond', NULL, 9.4), ('Up', NULL, 0.0), ('La La Land', 'romance', NULL);
+SELECT DISTINCT name, genre FROM movies ORDER BY name, genre;
+SELECT DISTINCT genre FROM movies ORDER BY genre DESC;
+SELECT DISTINCT rating FROM movies WHERE rating < 6.0 OR rating IS NULL ORDER BY rating;
+SELECT DISTINCT genre, rating FROM movies ORDER BY rating, genre LIMIT 3;
+SELECT DISTINCT * FROM movies ORDER BY name, rating;
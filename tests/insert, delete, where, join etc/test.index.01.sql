@@ -0,0 +1,19 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL);
+CREATE INDEX idx_piazza ON student (piazza);
+CREATE INDEX IF NOT EXISTS idx_piazza ON student (piazza);
+SELECT * FROM student WHERE piazza = 2 ORDER BY name;
+SELECT * FROM student WHERE piazza > 1 ORDER BY name;
+SELECT * FROM student WHERE piazza <= 2 ORDER BY name;
+SELECT * FROM student WHERE piazza != 2 ORDER BY name;
+SELECT * FROM student WHERE piazza IS NULL ORDER BY name;
+SELECT * FROM student WHERE piazza = 2 AND grade > 3.5 ORDER BY name;
+INSERT INTO student VALUES ('Bob', 3.0, 2);
+UPDATE student SET piazza = 4 WHERE name = 'Li';
+SELECT * FROM student WHERE piazza = 2 ORDER BY name;
+SELECT * FROM student WHERE piazza = 4 ORDER BY name;
+DELETE FROM student WHERE piazza = 1;
+SELECT * FROM student WHERE piazza < 3 ORDER BY name;
+DROP INDEX idx_piazza;
+DROP INDEX IF EXISTS idx_piazza;
+SELECT * FROM student WHERE piazza = 2 ORDER BY name;
@@ -0,0 +1,10 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3);
+CREATE INDEX idx_grade ON student (grade);
+CREATE INDEX idx_name ON student (name);
+UPDATE student SET grade = '3.5' WHERE name = 'Li';
+SELECT * FROM student ORDER BY grade;
+SELECT * FROM student WHERE grade = 3.5 ORDER BY name;
+UPDATE student SET name = 'Zed' WHERE piazza = 2;
+SELECT * FROM student WHERE name = 'Zed' ORDER BY piazza;
+SELECT * FROM student ORDER BY name;
@@ -0,0 +1,15 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL), ('Bob', 3.2, 1), ('Cal', NULL, 2);
+CREATE INDEX idx_grade ON student (grade);
+SELECT MIN(grade), MAX(grade) FROM student;
+SELECT MAX(grade) FROM student;
+SELECT * FROM student ORDER BY grade;
+SELECT * FROM student ORDER BY grade DESC;
+SELECT * FROM student ORDER BY grade DESC LIMIT 3;
+SELECT * FROM student ORDER BY grade LIMIT 2 OFFSET 2;
+SELECT * FROM student WHERE grade > 3.0 ORDER BY grade DESC;
+SELECT * FROM student WHERE grade <= 3.2 ORDER BY grade;
+SELECT * FROM student WHERE grade = 3.2 ORDER BY grade DESC;
+DELETE FROM student WHERE grade = 4.0;
+SELECT MIN(grade), MAX(grade) FROM student;
+SELECT * FROM student ORDER BY grade DESC;
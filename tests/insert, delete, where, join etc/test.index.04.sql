@@ -0,0 +1,15 @@
+CREATE TABLE t (a INTEGER, b REAL, name TEXT);
+INSERT INTO t VALUES (1, 2.5, 'one'), (0, 1.5, 'zero'), (3, 0.5, 'three'), (1, 3.5, 'uno'), (-2, 2.5, 'minus'), (2, NULL, 'two');
+CREATE INDEX idx_a ON t (a);
+SELECT * FROM t WHERE a <= 1;
+SELECT * FROM t WHERE a > 0;
+SELECT name FROM t WHERE a >= 1 AND b > 1.0;
+SELECT * FROM t WHERE a < 2 ORDER BY a DESC;
+SELECT * FROM t WHERE a != 1;
+CREATE INDEX idx_b ON t (b);
+SELECT * FROM t WHERE b < 3.0;
+SELECT * FROM t WHERE a > 0 AND b >= 2.5;
+SELECT * FROM t WHERE b > 1.0 AND a = 1;
+SELECT * FROM t WHERE b > 1.0 ORDER BY a;
+UPDATE t SET a = -5 WHERE name = 'three';
+SELECT * FROM t WHERE a < 1;
@@ -0,0 +1,8 @@
+CREATE TABLE students (name TEXT, id INTEGER);
+INSERT INTO students VALUES ('James', 1), ('Yaxin', 3), ('Li', 2), ('Ana', NULL), ('Bo', 5);
+CREATE TABLE grades (id INTEGER, grade REAL);
+INSERT INTO grades VALUES (3, 3.0), (1, 2.0), (3, 1.5), (NULL, 4.0), (1, 3.9), (7, 1.0);
+SELECT students.name, grades.grade FROM students LEFT OUTER JOIN grades ON students.id = grades.id ORDER BY students.name, grades.grade;
+SELECT students.name, grades.id FROM students LEFT OUTER JOIN grades ON students.id = grades.id WHERE grades.grade > 1.8 ORDER BY grades.grade DESC;
+SELECT students.name, grades.grade FROM students LEFT OUTER JOIN grades ON students.id = grades.id WHERE grades.grade IS NULL ORDER BY students.name;
+SELECT grades.grade, students.name FROM grades LEFT OUTER JOIN students ON grades.id = students.id ORDER BY grades.grade;
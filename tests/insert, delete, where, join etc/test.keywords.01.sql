@@ -0,0 +1,11 @@
+CREATE TABLE word (id INTEGER, text TEXT);
+INSERT INTO word VALUES (1, 'GROUP'), (2, 'HAVING'), (3, 'LIMIT'), (4, 'ORDER'), (5, 'BY'), (6, 'DISTINCT'), (7, 'WHERE');
+SELECT * FROM word WHERE text = 'GROUP' ORDER BY id;
+SELECT * FROM word WHERE text = 'HAVING' ORDER BY id;
+SELECT * FROM word WHERE text = 'LIMIT' ORDER BY id;
+SELECT id FROM word WHERE text = 'ORDER';
+SELECT * FROM word WHERE text IN ('BY', 'DISTINCT') ORDER BY id DESC;
+UPDATE word SET text = 'OFFSET' WHERE text = 'WHERE';
+SELECT * FROM word WHERE text = 'OFFSET' ORDER BY id LIMIT 1;
+DELETE FROM word WHERE text = 'FROM' OR text = 'GROUP';
+SELECT * FROM word ORDER BY text;
@@ -0,0 +1,9 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL), ('Bob', 3.7, 1);
+SELECT * FROM student ORDER BY name LIMIT 3;
+SELECT * FROM student ORDER BY name LIMIT 3 OFFSET 2;
+SELECT * FROM student ORDER BY name LIMIT 0;
+SELECT * FROM student ORDER BY name LIMIT 10 OFFSET 4;
+SELECT * FROM student ORDER BY name LIMIT 2 OFFSET 10;
+SELECT * FROM student ORDER BY grade DESC, name LIMIT 2;
+SELECT name FROM student WHERE piazza > 1 ORDER BY grade LIMIT 2 OFFSET 1;
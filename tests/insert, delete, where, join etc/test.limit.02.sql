@@ -0,0 +1,6 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL), ('Bob', 3.7, 1);
+SELECT DISTINCT piazza FROM student ORDER BY piazza LIMIT 2;
+SELECT DISTINCT grade FROM student ORDER BY grade DESC LIMIT 3 OFFSET 1;
+SELECT * FROM student ORDER BY piazza, name LIMIT -1;
+SELECT * FROM student ORDER BY piazza DESC, name DESC LIMIT 4 OFFSET 1;
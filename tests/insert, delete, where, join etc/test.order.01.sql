@@ -0,0 +1,8 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL), ('Bob', 3.7, 1);
+SELECT * FROM student ORDER BY piazza ASC, grade DESC;
+SELECT * FROM student ORDER BY piazza DESC, grade ASC;
+SELECT * FROM student ORDER BY grade DESC, piazza DESC, name;
+SELECT * FROM student ORDER BY grade, name DESC;
+SELECT name, piazza FROM student ORDER BY piazza DESC, name;
+SELECT * FROM student WHERE grade > 3.0 ORDER BY grade ASC, name DESC;
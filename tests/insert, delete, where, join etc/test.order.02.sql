@@ -0,0 +1,6 @@
+CREATE TABLE item (label TEXT, amount INTEGER);
+INSERT INTO item VALUES ('a', 3), ('b', NULL), ('c', -1), ('a', NULL), ('b', 3), ('c', 0);
+UPDATE item SET amount = '7' WHERE label = 'c' AND amount = 0;
+SELECT * FROM item ORDER BY amount, label;
+SELECT * FROM item ORDER BY amount DESC, label;
+SELECT * FROM item ORDER BY label DESC, amount DESC;
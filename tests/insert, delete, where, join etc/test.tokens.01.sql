@@ -0,0 +1,13 @@
+CREATE TABLE t (id INTEGER, name TEXT, score REAL);
+INSERT INTO t VALUES (1, 'it''s', -2.5), (2, 'a ? b', -7), (3, 'x, y; (z)', 0.25);
+INSERT INTO t VALUES	(4,'NULL',1.0),(5, '', -0.5);
+INSERT INTO t VALUES (6, 'SELECT * FROM t WHERE id = 1;', 3);
+SELECT * FROM t;
+SELECT id FROM t WHERE name = 'it''s';
+SELECT id FROM t WHERE score < -1 ORDER BY score;
+SELECT id, name FROM t WHERE name = 'a ? b' OR name = '';
+SELECT * FROM t WHERE name = 'NULL';
+SELECT * FROM t WHERE name IS NULL;
+SELECT id FROM t WHERE name = 'SELECT * FROM t WHERE id = 1;';
+UPDATE t SET name = '''quoted''' WHERE id = 3;
+SELECT * FROM t ORDER BY name;
@@ -0,0 +1,13 @@
+CREATE TABLE t (id INTEGER, score REAL, label TEXT);
+INSERT INTO t VALUES (1, 1.5, 'a'), (2, 2.5, 'b'), (3, NULL, 'c');
+CREATE INDEX idx_score ON t (score);
+UPDATE t SET score = 3 WHERE id = 1;
+SELECT * FROM t WHERE score = 3.0;
+UPDATE t SET id = '42', label = 7 WHERE label = 'b';
+SELECT * FROM t WHERE id = 42;
+SELECT * FROM t WHERE label = '7';
+UPDATE t SET id = 5.0, score = '0.25' WHERE id = 3;
+SELECT * FROM t ORDER BY score;
+UPDATE t SET label = 2.5;
+SELECT * FROM t WHERE score < 1;
+SELECT * FROM t ORDER BY id;
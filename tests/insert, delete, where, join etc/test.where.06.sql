@@ -0,0 +1,8 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL);
+SELECT * FROM student WHERE grade >= 3.2 ORDER BY name;
+SELECT * FROM student WHERE grade <= 3.2 ORDER BY name;
+SELECT * FROM student WHERE piazza >= 2 ORDER BY name;
+SELECT * FROM student WHERE piazza <= 2 ORDER BY name;
+SELECT * FROM student WHERE name <= 'Li' ORDER BY name;
+SELECT * FROM student WHERE name >= 'Li' ORDER BY name;
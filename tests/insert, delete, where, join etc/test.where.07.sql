@@ -0,0 +1,8 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL);
+SELECT * FROM student WHERE piazza IN (1, 3) ORDER BY name;
+SELECT * FROM student WHERE name IN ('Li', 'Ana', 'Bob') ORDER BY name;
+SELECT * FROM student WHERE grade IN (4.0) ORDER BY name;
+SELECT * FROM student WHERE grade BETWEEN 2.5 AND 3.5 ORDER BY name;
+SELECT * FROM student WHERE piazza BETWEEN 2 AND 3 ORDER BY name;
+SELECT * FROM student WHERE name BETWEEN 'B' AND 'M' ORDER BY name;
@@ -0,0 +1,11 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL);
+SELECT * FROM student WHERE grade > 3.0 AND piazza = 2 ORDER BY name;
+SELECT * FROM student WHERE grade < 3.0 OR piazza = 3 ORDER BY name;
+SELECT * FROM student WHERE NOT piazza = 2 ORDER BY name;
+SELECT * FROM student WHERE NOT grade > 3.0 ORDER BY name;
+SELECT * FROM student WHERE (grade > 3.5 OR piazza = 3) AND name != 'Yaxin' ORDER BY name;
+SELECT * FROM student WHERE grade > 3.5 OR (piazza = 3 AND name != 'Yaxin') ORDER BY name;
+SELECT * FROM student WHERE NOT (piazza IN (1, 2) OR grade BETWEEN 2.0 AND 3.0) ORDER BY name;
+SELECT * FROM student WHERE grade IS NULL OR piazza IS NULL ORDER BY name;
+SELECT * FROM student WHERE grade IS NOT NULL AND NOT name = 'Li' ORDER BY name;
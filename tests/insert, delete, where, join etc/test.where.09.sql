@@ -0,0 +1,8 @@
+CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL);
+UPDATE student SET grade = 3.9 WHERE piazza IN (2, 3) AND NOT name = 'Li';
+SELECT * FROM student ORDER BY name;
+DELETE FROM student WHERE grade BETWEEN 3.0 AND 3.95 OR piazza IS NULL;
+SELECT * FROM student ORDER BY name;
+UPDATE student SET piazza = 5 WHERE (name >= 'J' AND name <= 'K') OR grade < 3.0;
+SELECT * FROM student ORDER BY name;
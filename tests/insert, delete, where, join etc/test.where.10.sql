@@ -0,0 +1,19 @@
+CREATE TABLE t (a INTEGER, r REAL, name TEXT);
+INSERT INTO t VALUES (1, 2.0, '10'), (5, 0.5, '9'), (7, NULL, 'seven'), (NULL, 1.5, '2.5'), (4, 3.0, NULL);
+SELECT * FROM t WHERE a > '3' ORDER BY a;
+SELECT * FROM t WHERE a < 'b' ORDER BY a;
+SELECT * FROM t WHERE r >= 'abc' ORDER BY a;
+SELECT * FROM t WHERE name > 5 ORDER BY a;
+SELECT * FROM t WHERE name < 'a' AND name >= 10 ORDER BY a;
+SELECT * FROM t WHERE a BETWEEN 4 AND 'x' ORDER BY a;
+SELECT * FROM t WHERE name IN (9, 2.5, 'seven') ORDER BY a;
+SELECT * FROM t WHERE NOT a != '5';
+CREATE INDEX idx_a ON t (a);
+CREATE INDEX idx_name ON t (name);
+SELECT * FROM t WHERE a <= '5';
+SELECT * FROM t WHERE a > 'abc';
+SELECT * FROM t WHERE name > 9;
+SELECT * FROM t WHERE name = 10;
+UPDATE t SET r = 0.0 WHERE name < 3;
+DELETE FROM t WHERE a >= ' 5 ';
+SELECT * FROM t ORDER BY a;
@@ -0,0 +1,7 @@
+FILENAME: test11.db
+1: CREATE TABLE item (name TEXT, price REAL, qty INTEGER);
+1: INSERT INTO item VALUES ('it''s', 0.0, 0), ('', -1.5, -9223372036854775807), ('héllo ☃', NULL, 9223372036854775807);
+1: INSERT INTO item VALUES (NULL, 2.25, NULL), ('tab	in', 0.125, 42);
+1: CREATE INDEX idx_qty ON item (qty);
+1: SELECT * FROM item ORDER BY qty;
+1: CLOSE
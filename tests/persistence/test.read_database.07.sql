@@ -0,0 +1,8 @@
+OPEN: test11.db
+1: SELECT * FROM item ORDER BY qty;
+1: SELECT name FROM item WHERE qty > 0 ORDER BY qty;
+1: SELECT * FROM item WHERE name = '' OR name = 'it''s';
+1: SELECT * FROM item WHERE name IS NULL;
+1: INSERT INTO item VALUES ('new', 3.5, 7);
+1: SELECT name, qty FROM item WHERE qty < 10 ORDER BY qty;
+1: ENDTEST
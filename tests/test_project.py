@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# Checks for behaviour the .sql packs can't reach: storage modes other than the
+# default and the python-only api. Run with python -m unittest or pytest.
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bench
+import project
+
+
+def connect(columnar=False):
+    conn = project.connect(":memory:", columnar=columnar)
+    for name in ('t', 'u'):
+        conn.execute(f"DROP TABLE IF EXISTS {name};")
+    return conn
+
+
+class TestStatementCache(unittest.TestCase):
+    def test_reuse(self):
+        conn = connect()
+        conn.execute("CREATE TABLE t (a INTEGER);")
+        hits, misses = conn.cache_hits(), conn.cache_misses()
+        for i in range(3):
+            conn.execute("INSERT INTO t VALUES (1);")
+        self.assertEqual((conn.cache_hits() - hits, conn.cache_misses() - misses), (2, 1))
+        self.assertEqual(list(conn.execute("SELECT COUNT(*) FROM t;")), [(3,)])
+
+    def test_eviction(self):
+        cache = project.StatementCache(2)
+        first = cache.get("SELECT a FROM t;")
+        cache.get("SELECT b FROM t;")
+        self.assertIs(cache.get("SELECT a FROM t;"), first)  # now the most recently used
+        cache.get("SELECT c FROM t;")                        # evicts SELECT b
+        self.assertIs(cache.get("SELECT a FROM t;"), first)
+        cache.get("SELECT b FROM t;")
+        self.assertEqual((cache.hits(), cache.misses()), (2, 4))
+
+
+class TestTokenize(unittest.TestCase):
+    def test_scan(self):
+        tokens = list(project.scan("SELECT a FROM t WHERE b = 'it''s ?' AND c IS NOT NULL AND d > -1.5 AND e = ?;"))
+        self.assertEqual(tokens[:9], ['SELECT', 'a', 'FROM', 't', 'WHERE', 'b', '=', "it's ?", 'AND'])
+        self.assertEqual(tokens[9:], ['c', '!=', None, 'AND', 'd', '>', -1.5, 'AND', 'e', '=', project._PARAM, ';'])
+
+    def test_keywords_in_text(self):
+        tokens = project.tokenize("SELECT * FROM t WHERE name = 'ORDER' ORDER BY id;")
+        self.assertEqual(tokens[-4:], ['ORDER', 'BY', 't.id', ';'])
+        self.assertIsInstance(tokens[7], project.Text)
+
+
+class TestStreamingInsert(unittest.TestCase):
+    def test_matches_parsed_insert(self):
+        # long enough to take the streamed path, with a column list, defaults and a reject
+        rows = ", ".join(f"({i}, 'name {i}')" for i in range(5000)) + ", ('x', 'bad')"
+        statement = "INSERT INTO t (a, s) VALUES " + rows + ";"
+        self.assertGreaterEqual(len(statement), project._STREAM_INSERT_SIZE)
+        for columnar in (False, True):
+            conn = connect(columnar)
+            conn.execute("CREATE TABLE t (a INTEGER, r REAL DEFAULT 1.5, s TEXT);")
+            conn.execute(statement)
+            self.assertEqual([row for row, reason in conn.rejected()], [('x', 1.5, 'bad')])
+            conn.execute("CREATE TABLE u (a INTEGER, r REAL DEFAULT 1.5, s TEXT);")
+            for i in range(0, 5000, 1000):  # same rows in statements short enough to be parsed
+                conn.execute("INSERT INTO u (a, s) VALUES " + ", ".join(f"({j}, 'name {j}')" for j in range(i, i + 1000)) + ";")
+            self.assertEqual(list(conn.execute("SELECT * FROM t ORDER BY a;")), list(conn.execute("SELECT * FROM u ORDER BY a;")))
+            self.assertEqual(list(conn.execute("SELECT COUNT(*) FROM t;")), [(5000,)])
+
+
+class TestJoin(unittest.TestCase):
+    def test_strategies_agree(self):
+        # duplicate and NULL keys, with each side the smaller one so both hash builds run
+        left = [(1, 'a'), (None, 'b'), (2, 'c'), (1, 'd'), (4, 'e')]
+        right = [(1, 'x'), (2, 'y'), (None, 'z'), (1, 'w')]
+        for lhs, rhs in ((left, right), (right, left)):
+            expected = list(project.nested_loop_join(lhs, rhs, 0, 0, 2))
+            self.assertEqual(list(project.hash_join(lhs, rhs, 0, 0, 2)), expected)
+        self.assertEqual(list(project.nested_loop_join(left, right, 0, 0, 2))[:3],
+                         [(1, 'a', 1, 'x'), (1, 'a', 1, 'w'), (None, 'b', None, None)])
+
+
+class TestColumnStore(unittest.TestCase):
+    def test_round_trip(self):
+        # NULLs in every column, across chunk boundaries, through append, extend and set
+        n = project._BATCH_ROWS + 10
+        rows = [(None if i % 7 == 0 else i, None if i % 5 == 0 else i / 4, None if i % 3 == 0 else f"s{i}")
+                for i in range(n)]
+        store = project.ColumnStore(['INTEGER', 'REAL', 'TEXT'])
+        for row in rows[:5]:
+            store.append(row)
+        store.extend_columns([list(col) for col in zip(*rows[5:])])
+        self.assertEqual(store.rows(), rows)
+        self.assertEqual(store.get(n - 1), rows[n - 1])
+        store.set(0, (1, 0.5, 'x'))
+        store.set(1, (None, None, None))
+        self.assertEqual(store.rows()[:2], [(1, 0.5, 'x'), (None, None, None)])
+        self.assertEqual(store.column(0)[2:], [row[0] for row in rows[2:]])
+
+    def test_fallback_to_list(self):
+        # a value an array can't hold turns its column into plain lists, others stay arrays
+        store = project.ColumnStore(['INTEGER', 'REAL'])
+        store.extend_columns([[1, None, 3], [1.5, 2.5, None]])
+        snapshot = store.clone()
+        store.append((2 ** 70, 4.5))
+        store.set(1, (-2 ** 70, None))
+        self.assertEqual(store.rows(), [(1, 1.5), (-2 ** 70, None), (3, None), (2 ** 70, 4.5)])
+        self.assertEqual(snapshot.rows(), [(1, 1.5), (None, 2.5), (3, None)])
+        store.delete({0})
+        self.assertEqual(store.column(0), [-2 ** 70, 3, 2 ** 70])
+
+
+class TestRowAccess(unittest.TestCase):
+    def test_rows_keep_their_version(self):
+        for columnar in (False, True):
+            conn = connect(columnar)
+            conn.execute("CREATE TABLE t (a INTEGER, s TEXT);")
+            conn.execute("INSERT INTO t VALUES (1, 'one'), (2, 'two');")
+            table = conn.db().grab_table('t')
+            held = table.grab_row(0)
+            rows = table.grab_rows()
+            rows.sort(reverse=True)  # the list is the caller's own
+            conn.execute("UPDATE t SET s = 'uno' WHERE a = 1;")
+            self.assertEqual(held, (1, 'one'))
+            self.assertEqual(rows, [(2, 'two'), (1, 'one')])
+            self.assertEqual(list(table.iter_rows()), [(1, 'uno'), (2, 'two')])
+            self.assertEqual(table.count(), 2)
+
+
+class TestCursor(unittest.TestCase):
+    def test_fetch(self):
+        conn = connect()
+        conn.execute("CREATE TABLE t (a INTEGER);")
+        conn.executemany("INSERT INTO t VALUES (?);", [(i,) for i in range(10)])
+        cursor = conn.cursor().execute("SELECT a FROM t WHERE a > ? ORDER BY a DESC;", (2,))
+        self.assertEqual(cursor.fetchone(), (9,))
+        self.assertEqual(cursor.fetchmany(), [(8,)])
+        cursor.arraysize = 2
+        self.assertEqual(cursor.fetchmany(), [(7,), (6,)])
+        self.assertEqual(cursor.fetchmany(1), [(5,)])
+        self.assertEqual(next(cursor), (4,))
+        self.assertEqual(list(cursor), [(3,)])
+        self.assertEqual((cursor.fetchone(), cursor.fetchmany(), cursor.fetchall()), (None, [], []))
+
+    def test_write_while_reading(self):
+        # an open cursor keeps the rows it was going to return when the table changes
+        for columnar in (False, True):
+            conn = connect(columnar)
+            conn.execute("CREATE TABLE t (a INTEGER);")
+            conn.executemany("INSERT INTO t VALUES (?);", [(i,) for i in range(5)])
+            cursor = conn.execute("SELECT a FROM t WHERE a < 4;")
+            self.assertEqual(cursor.fetchone(), (0,))
+            conn.execute("DELETE FROM t WHERE a = 2;")
+            conn.execute("UPDATE t SET a = 10 WHERE a = 1;")
+            self.assertEqual(cursor.fetchall(), [(1,), (2,), (3,)])
+            cursor.close()
+            self.assertEqual(list(conn.execute("SELECT a FROM t;")), [(0,), (10,), (3,), (4,)])
+
+
+class TestDistinct(unittest.TestCase):
+    def test_spill(self):
+        # a tiny budget sends most rows through the spill files, first-seen order is kept
+        rows = [(i % 37, f"v{i % 11}") for i in range(2000)] + [(None, None), (1, 'v1')]
+        expected = list(dict.fromkeys(rows))
+        budget = project._DISTINCT_MEMORY
+        project._DISTINCT_MEMORY = 1
+        try:
+            self.assertEqual(list(project.distinct_rows(rows)), expected)
+            conn = connect()
+            conn.execute("CREATE TABLE t (a INTEGER, b TEXT);")
+            conn.executemany("INSERT INTO t VALUES (?, ?);", rows)
+            self.assertEqual(list(conn.execute("SELECT DISTINCT a, b FROM t;")), expected)
+        finally:
+            project._DISTINCT_MEMORY = budget
+
+
+class TestMemory(unittest.TestCase):
+    def test_memory_report(self):
+        sizes = {}
+        for columnar in (False, True):
+            conn = connect(columnar)
+            conn.execute("CREATE TABLE t (a INTEGER, r REAL);")
+            conn.executemany("INSERT INTO t VALUES (?, ?);", [(i, i / 2) for i in range(4000)])
+            conn.execute("DELETE FROM t WHERE a < 1000;")
+            report = conn.memory_report()['t']
+            self.assertEqual((report['rows'], report['dead']), (3000, 1000))
+            self.assertEqual(report['indexes'], 0)
+            conn.execute("CREATE INDEX idx_a ON t (a);")
+            indexed = conn.memory_report()['t']
+            self.assertGreater(indexed['indexes'], 0)
+            self.assertEqual(indexed['total'], indexed['store'] + indexed['indexes'])
+            self.assertIsInstance(conn.db().grab_table('t').grab_row(0), tuple)
+            sizes[columnar] = report['store']
+        self.assertLess(sizes[True], sizes[False] / 2)  # arrays hold numbers without objects
+
+
+class TestBench(unittest.TestCase):
+    def test_benchmarks_run(self):
+        # every benchmark at a small size, the variants of each have to agree
+        sizes = bench.SIZES
+        bench.SIZES = [300]
+        try:
+            with redirect_stdout(StringIO()) as out:
+                for name, fn in bench.BENCHMARKS.items():
+                    fn()
+        finally:
+            bench.SIZES = sizes
+        self.assertIn("us/row", out.getvalue())
+
+
+class TestWhere(unittest.TestCase):
+    def test_mixed_types(self):
+        # numbers sort before text and literals take their column's affinity,
+        # in rows, batches and indexes
+        for columnar in (False, True):
+            for indexed in (False, True):
+                conn = connect(columnar)
+                conn.execute("CREATE TABLE t (a INTEGER, name TEXT);")
+                conn.execute("INSERT INTO t VALUES (1, '10'), (5, '9'), (NULL, 'x');")
+                if indexed:
+                    conn.execute("CREATE INDEX idx_a ON t (a);")
+                    conn.execute("CREATE INDEX idx_name ON t (name);")
+                self.assertEqual(list(conn.execute("SELECT a FROM t WHERE a < 'b';")), [(1,), (5,)])
+                self.assertEqual(list(conn.execute("SELECT a FROM t WHERE a > '3';")), [(5,)])
+                self.assertEqual(list(conn.execute("SELECT a FROM t WHERE a BETWEEN 2 AND 'z';")), [(5,)])
+                self.assertEqual(list(conn.execute("SELECT name FROM t WHERE name > 5 ORDER BY name;")), [('9',), ('x',)])
+                self.assertEqual(list(conn.execute("SELECT a FROM t WHERE NOT name < 10;")), [(1,), (5,), (None,)])
+
+
+class TestValidation(unittest.TestCase):
+    def test_insert_rejects(self):
+        for columnar in (False, True):
+            conn = connect(columnar)
+            conn.execute("CREATE TABLE t (a INTEGER, r REAL, s TEXT);")
+            conn.execute("INSERT INTO t VALUES (1, 2, 3), ('x', 1.0, 'ok'), ('4', '2.5', 'b');")
+            self.assertEqual([row for row, reason in conn.rejected()], [('x', 1.0, 'ok')])
+            self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1, 2.0, '3'), (4, 2.5, 'b')])
+
+    def test_update_rejects(self):
+        for columnar in (False, True):
+            conn = connect(columnar)
+            conn.execute("CREATE TABLE t (a INTEGER, r REAL);")
+            conn.execute("INSERT INTO t VALUES (1, 2.0), (2, 3.5);")
+            conn.execute("CREATE INDEX idx_a ON t (a);")
+            conn.execute("UPDATE t SET r = 3, a = 'hello' WHERE a > 0;")
+            self.assertEqual([row for row, reason in conn.rejected()], [('hello', 3), ('hello', 3)])
+            self.assertIn("can't be stored", conn.rejected()[0][1])
+            self.assertEqual(list(conn.execute("SELECT * FROM t WHERE a > 0;")), [(1, 2.0), (2, 3.5)])
+            conn.execute("UPDATE t SET r = 3 WHERE a = 1;")
+            self.assertEqual(conn.rejected(), [])
+            self.assertEqual(list(conn.execute("SELECT r FROM t WHERE a = 1;")), [(3.0,)])
+            self.assertIsInstance(list(conn.execute("SELECT r FROM t WHERE a = 1;"))[0][0], float)
+
+
+class TestSnapshots(unittest.TestCase):
+    def test_transaction_copies(self):
+        # enough rows and distinct values for several store chunks and index shards
+        rows = [(i % 1500, f"name {i}") for i in range(5000)]
+        for columnar in (False, True):
+            project._ALL_DATABASES.pop("snap.db", None)
+            one = project.connect("snap.db", columnar=columnar)
+            two = project.connect("snap.db", columnar=columnar)
+            try:
+                one.execute("CREATE TABLE t (a INTEGER, b TEXT);")
+                one.executemany("INSERT INTO t VALUES (?, ?);", rows)
+                one.execute("CREATE INDEX idx_a ON t (a);")
+                one.execute("BEGIN TRANSACTION;")
+                one.execute("UPDATE t SET a = 9999 WHERE a = 3;")
+                one.execute("DELETE FROM t WHERE a = 1499;")
+                one.execute("INSERT INTO t VALUES (-1, 'new');")
+                self.assertEqual(len(list(two.execute("SELECT * FROM t WHERE a = 3;"))), 4)
+                self.assertEqual(list(two.execute("SELECT MIN(a), MAX(a), COUNT(*) FROM t;")), [(0, 1499, 5000)])
+                one.execute("COMMIT;")
+                self.assertEqual(list(two.execute("SELECT MIN(a), MAX(a), COUNT(*) FROM t;")), [(-1, 9999, 4998)])
+                one.execute("UPDATE t SET b = 'again' WHERE a = 9999;")
+                self.assertEqual([row[1] for row in two.execute("SELECT * FROM t WHERE a = 9999;")], ['again'] * 4)
+                self.assertEqual(list(two.execute("SELECT COUNT(*) FROM t WHERE a < 0;")), [(1,)])
+            finally:
+                one.close()
+                two.close()
+                for name in ("snap.db", "snap.db-wal"):
+                    if os.path.exists(name):
+                        os.remove(name)
+
+
+class FileCase(unittest.TestCase):
+    # each test gets a database file in its own temporary directory
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "test.db")
+
+    def tearDown(self):
+        self.crash()
+        shutil.rmtree(self.dir)
+
+    def crash(self):
+        # forgets the in-memory state of the file, as if the process had died
+        for shared in (project._ALL_DATABASES, project._LOCKS, project._WALS):
+            shared.pop(self.path, None)
+
+    def wal_size(self):
+        wal = self.path + "-wal"
+        return os.path.getsize(wal) if os.path.exists(wal) else 0
+
+
+class TestFileFormat(FileCase):
+    def test_round_trip(self):
+        rows = [(2 ** 70, 'héllo ☃', 0.0), (-2 ** 63, '', None), (None, None, -1.5), (0, "it's", 2.25)]
+        for columnar in (False, True):
+            conn = project.connect(self.path, columnar=columnar)
+            conn.execute("CREATE TABLE t (a INTEGER, b TEXT, c REAL);")
+            conn.executemany("INSERT INTO t VALUES (?, ?, ?);", rows)
+            conn.execute("CREATE INDEX idx_b ON t (b);")
+            conn.close()
+            self.crash()
+            with open(self.path, 'rb') as fp:
+                self.assertEqual(fp.read(len(project._FILE_MAGIC)), project._FILE_MAGIC)
+            conn = project.connect(self.path)
+            table = conn.db().grab_table('t')
+            self.assertEqual(table.grab_rows(), rows)
+            self.assertEqual(table.columnar(), columnar)
+            self.assertIsNotNone(conn.db().grab_index('idx_b'))
+            self.assertEqual(list(conn.execute("SELECT a FROM t WHERE b = '';")), [(-2 ** 63,)])
+            conn.execute("DROP TABLE t;")
+            conn.close()
+            self.crash()
+
+    def test_xml_file(self):
+        # files written before the binary format open and are rewritten on close
+        with open(self.path, 'w') as fp:
+            fp.write("<old><t><columnquery>(a INTEGER, b TEXT)</columnquery>"
+                     "<rowquery>(1, 'one'), (2, NULL)</rowquery>"
+                     "<indexquery>CREATE INDEX idx_a ON t (a);</indexquery></t></old>")
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT * FROM t WHERE a > 1;")), [(2, None)])
+        conn.close()
+        self.crash()
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1, 'one'), (2, None)])
+        self.assertIsNotNone(conn.db().grab_index('idx_a'))
+
+
+class TestLazyOpen(FileCase):
+    def test_tables_load_on_first_use(self):
+        conn = project.connect(self.path)
+        for name in ('t', 'u', 'v'):
+            conn.execute(f"CREATE TABLE {name} (a INTEGER, b TEXT);")
+            conn.execute(f"INSERT INTO {name} VALUES (1, '{name}'), (2, NULL);")
+        conn.execute("CREATE INDEX idx_u ON u (a);")
+        conn.close()
+        self.crash()
+        conn = project.connect(self.path, lazy=True)
+        db = conn.db()
+        self.assertTrue(all(db.grab_lazy(name) for name in ('t', 'u', 'v')))
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1, 't'), (2, None)])
+        self.assertIsNone(db.grab_lazy('t'))
+        self.assertIsNotNone(db.grab_lazy('u'))
+        self.assertIsNotNone(db.grab_index('idx_u'))  # loads the table that owns it
+        self.assertIsNone(db.grab_lazy('u'))
+        self.assertEqual(list(conn.execute("SELECT b FROM u WHERE a = 2;")), [(None,)])
+        conn.execute("DROP TABLE v;")  # never loaded
+        conn.close()
+        self.crash()
+        conn = project.connect(self.path)
+        self.assertIsNone(conn.db().grab_table('v'))
+        self.assertEqual(list(conn.execute("SELECT * FROM u;")), [(1, 'u'), (2, None)])
+
+
+class TestBulkLoad(FileCase):
+    def test_load_rows(self):
+        conn = project.connect(self.path)
+        conn.execute("CREATE TABLE t (a INTEGER, r REAL DEFAULT 0.5, s TEXT);")
+        conn.execute("CREATE INDEX idx_a ON t (a);")
+        done = []
+        rows = ((i, f"s{i}") for i in range(5000))  # any iterable, not only lists
+        self.assertEqual(conn.load_rows('t', rows, cols=['a', 's'], progress=lambda n, rate: done.append(n)), 5000)
+        self.assertEqual(done[-1], 5000)
+        self.assertEqual(conn.load_rows('t', [('3', 'x'), ('y', 'z')], cols=['a', 's']), 1)
+        self.assertEqual([row for row, reason in conn.rejected()], [('y', 0.5, 'z')])
+        self.assertEqual(list(conn.execute("SELECT * FROM t WHERE a = 3;")), [(3, 0.5, 's3'), (3, 0.5, 'x')])
+        conn.execute("BEGIN TRANSACTION;")
+        conn.load_rows('t', [(-1, 1.0, 'gone')])
+        conn.execute("ROLLBACK;")
+        self.crash()
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT COUNT(*), MIN(a) FROM t;")), [(5001, 0)])
+
+    def test_load_csv(self):
+        conn = project.connect(self.path)
+        conn.execute("CREATE TABLE t (a INTEGER, r REAL, s TEXT DEFAULT 'd');")
+        path = os.path.join(self.dir, "rows.tsv")
+        with open(path, 'w') as fp:
+            fp.write("r\ta\n1.5\t1\n\t2\n\n2.5\tthree\n3.5\t4\n")
+        self.assertEqual(conn.load_csv('t', path), 3)
+        self.assertEqual(len(conn.rejected()), 1)
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1, 1.5, 'd'), (2, None, 'd'), (4, 3.5, 'd')])
+
+
+class TestLog(FileCase):
+    def test_recovery(self):
+        conn = project.connect(self.path)
+        conn.execute("CREATE TABLE t (a INTEGER, b TEXT);")
+        conn.execute("INSERT INTO t VALUES (1, 'one');")
+        conn.execute("BEGIN TRANSACTION;")
+        conn.execute("INSERT INTO t VALUES (2, 'two');")
+        conn.execute("COMMIT;")
+        conn.execute("BEGIN TRANSACTION;")
+        conn.execute("INSERT INTO t VALUES (3, 'three');")
+        conn.execute("ROLLBACK;")
+        conn.execute("UPDATE t SET b = 'ONE' WHERE a = 1;")
+        self.crash()
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1, 'ONE'), (2, 'two')])
+
+    def test_torn_tail(self):
+        # a record cut short by a crash is dropped, the ones before it are kept
+        conn = project.connect(self.path)
+        conn.execute("CREATE TABLE t (a INTEGER);")
+        conn.execute("INSERT INTO t VALUES (1);")
+        conn.execute("INSERT INTO t VALUES (2);")
+        self.crash()
+        with open(self.path + "-wal", 'r+b') as fp:
+            fp.truncate(self.wal_size() - 3)
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1,)])
+        conn.execute("INSERT INTO t VALUES (3);")  # the log is usable past the torn record
+        self.crash()
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1,), (3,)])
+
+    def test_stale_log(self):
+        # a log left from before the last checkpoint doesn't belong to the file, it isn't replayed
+        conn = project.connect(self.path)
+        conn.execute("CREATE TABLE t (a INTEGER);")
+        conn.execute("INSERT INTO t VALUES (1);")
+        with open(self.path + "-wal", 'rb') as fp:
+            old = fp.read()
+        conn.close()
+        self.crash()
+        with open(self.path + "-wal", 'wb') as fp:
+            fp.write(old)
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT * FROM t;")), [(1,)])
+
+    def test_executemany(self):
+        # a large executemany outside a transaction is checkpointed, a small one logged
+        conn = project.connect(self.path)
+        conn.execute("CREATE TABLE t (a INTEGER, b TEXT);")
+        rows = [(i, f"row {i}") for i in range(5000)]
+        conn.executemany("INSERT INTO t VALUES (?, ?);", rows)
+        self.assertEqual(self.wal_size(), 0)
+        conn.executemany("INSERT INTO t VALUES (?, ?);", [(-1, 'small')])
+        self.assertGreater(self.wal_size(), 0)
+        conn.execute("BEGIN TRANSACTION;")
+        conn.executemany("INSERT INTO t VALUES (?, ?);", rows)
+        conn.execute("COMMIT;")
+        self.crash()
+        conn = project.connect(self.path)
+        self.assertEqual(list(conn.execute("SELECT COUNT(*), MIN(a) FROM t;")), [(10001, -1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3);
+1: CREATE INDEX idx_piazza ON student (piazza);
+1: BEGIN TRANSACTION;
+1: UPDATE student SET piazza = 7 WHERE name = 'Li';
+1: INSERT INTO student VALUES ('Ana', 2.5, 2);
+2: SELECT * FROM student WHERE piazza = 2;
+1: SELECT * FROM student WHERE piazza = 2;
+1: COMMIT;
+2: SELECT * FROM student WHERE piazza >= 2 ORDER BY name;
+1: UPDATE student SET piazza = 2 WHERE name = 'James';
+1: DELETE FROM student WHERE name = 'Yaxin';
+2: SELECT * FROM student WHERE piazza = 2;
+2: BEGIN TRANSACTION;
+2: UPDATE student SET grade = 1.0 WHERE piazza = 2;
+2: ROLLBACK;
+1: SELECT * FROM student ORDER BY piazza;
+1: BEGIN TRANSACTION;
+1: INSERT INTO student VALUES ('Bob', 3.7, 2);
+1: COMMIT;
+2: SELECT * FROM student WHERE piazza = 2;
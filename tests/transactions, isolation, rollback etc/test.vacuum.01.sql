@@ -0,0 +1,19 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL), ('Bob', 3.7, 1), ('Cal', 1.0, 4), ('Dee', 2.2, 5);
+1: CREATE INDEX idx_piazza ON student (piazza);
+1: DELETE FROM student WHERE name = 'Li';
+1: SELECT * FROM student;
+1: SELECT * FROM student WHERE piazza = 2;
+1: SELECT COUNT(*), MAX(piazza) FROM student;
+1: INSERT INTO student VALUES ('Eve', 3.3, 2);
+1: UPDATE student SET grade = 0.5 WHERE piazza IS NULL;
+1: SELECT * FROM student;
+1: VACUUM;
+1: SELECT * FROM student;
+1: SELECT * FROM student WHERE piazza = 2 ORDER BY piazza DESC;
+1: DELETE FROM student WHERE piazza > 1;
+1: SELECT * FROM student;
+1: DELETE FROM student WHERE grade < 5.0;
+1: SELECT COUNT(*) FROM student;
+1: INSERT INTO student VALUES ('Fay', 3.0, 6);
+1: SELECT * FROM student WHERE piazza = 6;
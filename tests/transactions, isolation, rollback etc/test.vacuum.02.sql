@@ -0,0 +1,17 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 4.0, 1), ('Yaxin', 4.0, 2), ('Li', 3.2, 2), ('Sam', NULL, 3), ('Ana', 2.5, NULL);
+1: BEGIN TRANSACTION;
+1: DELETE FROM student WHERE piazza = 2;
+1: SELECT * FROM student ORDER BY name;
+2: SELECT * FROM student ORDER BY name;
+1: ROLLBACK TRANSACTION;
+2: SELECT * FROM student ORDER BY name;
+2: DELETE FROM student WHERE name = 'Sam';
+2: VACUUM;
+1: SELECT * FROM student ORDER BY name;
+1: BEGIN TRANSACTION;
+1: DELETE FROM student WHERE name = 'Ana';
+1: COMMIT TRANSACTION;
+2: SELECT * FROM student ORDER BY name;
+2: BEGIN TRANSACTION;
+2: VACUUM;
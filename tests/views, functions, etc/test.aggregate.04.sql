@@ -0,0 +1,9 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 3.5, 1), ('Yaxin', 3.51, 3), ('Li', 3.0, 2), ('Sam', NULL, 2), ('Ana', 2.0, NULL);
+1: SELECT COUNT(*) FROM student;
+1: SELECT COUNT(grade), COUNT(piazza) FROM student;
+1: SELECT SUM(piazza), AVG(piazza) FROM student;
+1: SELECT SUM(grade), AVG(grade), MIN(grade), MAX(grade) FROM student;
+1: SELECT MIN(name), MAX(name) FROM student;
+1: SELECT COUNT(*), SUM(piazza) FROM student WHERE grade > 3.0;
+1: SELECT COUNT(*), SUM(piazza), AVG(grade), MIN(name) FROM student WHERE grade > 5.0;
@@ -0,0 +1,8 @@
+1: CREATE TABLE note (id INTEGER, body TEXT);
+1: INSERT INTO note VALUES (1, '12'), (2, 'abc'), (3, '1.5'), (4, NULL), (5, ' 7'), (6, '3x'), (7, '1e2'), (8, '');
+1: SELECT SUM(body), AVG(body), COUNT(body) FROM note;
+1: SELECT SUM(body), AVG(body) FROM note WHERE id = 1;
+1: SELECT SUM(body), AVG(body) FROM note WHERE id = 2;
+1: SELECT SUM(body) FROM note WHERE id < 3;
+1: SELECT SUM(body) FROM note WHERE id IN (1, 5);
+1: SELECT id, SUM(body) FROM note GROUP BY id;
@@ -0,0 +1,9 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 3.5, 1), ('Yaxin', 3.51, 3), ('Li', 3.0, 2), ('Bo', NULL, 2);
+1: SELECT COUNT(*) FROM student ORDER BY COUNT(*);
+1: SELECT COUNT(*), MAX(grade) FROM student ORDER BY MAX(grade) DESC, name;
+1: SELECT MIN(piazza) FROM student WHERE grade > 3.2 ORDER BY student.grade;
+1: CREATE INDEX idx_piazza ON student (piazza);
+1: SELECT MAX(piazza) FROM student ORDER BY name;
+1: SELECT COUNT(*) FROM student ORDER BY COUNT(*) LIMIT 1 OFFSET 1;
+1: SELECT MAX(piazza) FROM student ORDER BY missing;
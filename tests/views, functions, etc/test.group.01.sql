@@ -0,0 +1,7 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 3.5, 1), ('Yaxin', 3.51, 3), ('Li', 3.0, 2), ('Sam', NULL, 2), ('Ana', 2.0, NULL), ('Bob', 4.0, 1), ('Cal', 2.5, NULL);
+1: SELECT piazza, COUNT(*) FROM student GROUP BY piazza;
+1: SELECT piazza, COUNT(grade), SUM(grade), AVG(grade), MIN(grade), MAX(grade) FROM student GROUP BY piazza;
+1: SELECT piazza, MAX(grade), name FROM student GROUP BY piazza;
+1: SELECT piazza, COUNT(*) FROM student WHERE grade > 2.2 GROUP BY piazza;
+1: SELECT piazza, COUNT(*) FROM student GROUP BY piazza ORDER BY piazza DESC;
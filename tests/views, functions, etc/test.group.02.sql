@@ -0,0 +1,7 @@
+1: CREATE TABLE student (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO student VALUES ('James', 3.5, 1), ('Yaxin', 3.51, 3), ('Li', 3.0, 2), ('Sam', NULL, 2), ('Ana', 2.0, NULL), ('Bob', 4.0, 1), ('Cal', 2.5, NULL);
+1: SELECT piazza, COUNT(*) FROM student GROUP BY piazza HAVING COUNT(*) > 1;
+1: SELECT piazza, AVG(grade) FROM student GROUP BY piazza HAVING AVG(grade) >= 3.0;
+1: SELECT piazza, SUM(grade) FROM student GROUP BY piazza HAVING SUM(grade) > 3.0 AND COUNT(*) = 2;
+1: SELECT piazza, grade, COUNT(*) FROM student GROUP BY piazza, grade HAVING COUNT(*) = 1 ORDER BY grade;
+1: SELECT piazza, MAX(grade) FROM student WHERE name != 'Bob' GROUP BY piazza HAVING MAX(grade) < 3.6 ORDER BY piazza DESC;
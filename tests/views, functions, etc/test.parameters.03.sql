@@ -0,0 +1,11 @@
+1: CREATE TABLE students (name TEXT, grade REAL, class INTEGER DEFAULT 100);
+Parameters: [("O'Brien", 3.5), ('Who?', None), ('Li', 2)]
+1: INSERT INTO students (name, grade) VALUES (?, ?);
+Parameters: [('Sam', 4.0, 480), ('Ana', 2.5, None)]
+1: INSERT INTO students VALUES (?, ?, ?);
+1: SELECT * FROM students ORDER BY name;
+Parameters: [(3.9, 'Li'), (1.0, 'Who?')]
+1: UPDATE students SET grade = ? WHERE name = ?;
+Parameters: [('Ana',), ("O'Brien",)]
+1: DELETE FROM students WHERE name = ?;
+1: SELECT * FROM students ORDER BY grade DESC;
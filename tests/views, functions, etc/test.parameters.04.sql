@@ -0,0 +1,5 @@
+1: CREATE TABLE numbers (n INTEGER, half REAL, label TEXT);
+Parameters: [(i, i / 2, 'n' + str(i)) for i in range(2000)]
+1: INSERT INTO numbers VALUES (?, ?, ?);
+1: SELECT COUNT(*), SUM(n), MAX(half), MIN(label) FROM numbers;
+1: SELECT * FROM numbers WHERE n > 1995 ORDER BY n DESC;
@@ -0,0 +1,10 @@
+1: CREATE TABLE students (name TEXT, grade REAL, piazza INTEGER);
+1: INSERT INTO students VALUES ('James', 2.4, 1), ('Yaxin', 3.5, 3), ('Li', 3.7, 2), ('Charles', 4.0, 3), ('Anna', 3.5, 1), ('Bo', NULL, 2);
+1: CREATE VIEW good AS SELECT name, grade, piazza FROM students WHERE grade >= 3.5 ORDER BY grade DESC, name;
+1: SELECT * FROM good WHERE piazza > 1 ORDER BY name LIMIT 2;
+1: SELECT DISTINCT grade FROM good WHERE name != 'Li' ORDER BY grade;
+1: SELECT name FROM good WHERE grade < 4.0 ORDER BY piazza DESC, name LIMIT 2 OFFSET 1;
+1: SELECT piazza, COUNT(name), MAX(grade) FROM good GROUP BY piazza ORDER BY piazza;
+1: SELECT DISTINCT piazza FROM students WHERE grade > 2.0 OR grade IS NULL ORDER BY piazza DESC LIMIT 2;
+1: UPDATE students SET grade = 3.9 WHERE name = 'James';
+1: SELECT * FROM good ORDER BY grade, name LIMIT 3;